@@ -0,0 +1,46 @@
+# Benchmark for BlockRenderer: time to re-render a long post after a one
+# character edit, compared with a full conversion of the same document.
+#
+#     python benchmarks/bench_block_render.py [--sizes 10K,200K,1M]
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import make_sections, parse_size
+from md2html_core import BlockRenderer, MarkdownConverter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental block rendering.")
+    parser.add_argument("--sizes", default="10K,200K,1M")
+    args = parser.parse_args()
+
+    converter = MarkdownConverter({})
+    print(f"{'size':>8} {'blocks':>7} {'full':>11} {'after edit':>11} {'speedup':>8}")
+    for size_text in args.sizes.split(","):
+        md_content = make_sections(parse_size(size_text))
+        renderer = BlockRenderer(MarkdownConverter({}))
+        renderer.render(md_content)
+
+        start = time.perf_counter()
+        expected = converter.convert(md_content)
+        full = time.perf_counter() - start
+
+        # Edit one character in the middle of the document.
+        middle = md_content.index("Some", len(md_content) // 2)
+        edited = md_content[:middle] + "X" + md_content[middle + 1:]
+        start = time.perf_counter()
+        actual = renderer.render(edited)
+        incremental = time.perf_counter() - start
+        assert actual == converter.convert(edited)
+
+        blocks = len(renderer.block_html)
+        print(f"{size_text:>8} {blocks:>7} {full * 1000:>9.1f}ms {incremental * 1000:>9.2f}ms "
+              f"{full / incremental:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# Benchmark for the editor's incremental syntax highlighting on a blog corpus
+# of --lines lines, with the buffer held in a list instead of a Text widget
+# (so Tk's own tag bookkeeping is not included). Reports the time to tag the
+# whole document in idle slices, and the per-keystroke cost of typing at
+# random places, of opening a fence (which re-tags the visible lines only),
+# of typing below the lines idle time has tagged so far in a document just
+# opened, and of a full re-tag, which is what a naive <KeyRelease> handler
+# would do.
+#
+#     python benchmarks/bench_highlight.py [--lines 100000] [--keys 2000]
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import make_corpus
+from md2html_highlight import IncrementalHighlighter
+
+VISIBLE_LINES = 40
+
+
+class ListBuffer:
+    def __init__(self, lines):
+        self.lines = lines
+        self.tagged = 0
+        self.highlighter = IncrementalHighlighter(self.get_lines, self.apply)
+        self.highlighter.reset(len(lines))
+
+    def get_lines(self, first, last):
+        return self.lines[first:last]
+
+    def apply(self, first, last, spans):
+        self.tagged += last - first
+
+    def edit(self, line, text):
+        # Replaces one line, then tags what is on screen, as the editor does.
+        self.lines[line] = text
+        self.highlighter.lines_replaced(line, 1, 1)
+        self.highlighter.run_edit(line, line + VISIBLE_LINES)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[round(q * (len(values) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental syntax highlighting.")
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--keys", type=int, default=2000)
+    args = parser.parse_args()
+
+    lines = []
+    seed = 0
+    while len(lines) < args.lines:
+        lines += make_corpus("blog", 256 * 1024, seed).split("\n")
+        seed += 1
+    buffer = ListBuffer(lines[:args.lines])
+
+    start = time.perf_counter()
+    slices = 0
+    while buffer.highlighter.has_work():
+        buffer.highlighter.run(deadline=time.perf_counter() + 0.01)
+        slices += 1
+    initial = time.perf_counter() - start
+    print(f"{args.lines} lines: initial tagging {initial * 1000:.0f}ms in {slices} idle slice(s)")
+
+    rnd = random.Random(0)
+    timings = []
+    for _ in range(args.keys):
+        line = rnd.randrange(args.lines)
+        text = buffer.lines[line]
+        start = time.perf_counter()
+        buffer.edit(line, text + "x")
+        timings.append(time.perf_counter() - start)
+        buffer.highlighter.run()
+    print(f"keystroke: p50 {percentile(timings, 0.5) * 1e6:.0f}us  p99 {percentile(timings, 0.99) * 1e6:.0f}us")
+
+    # Opening a fence turns everything below into code: only the visible
+    # lines are tagged at once, the rest is left to idle time.
+    line = args.lines // 2
+    buffer.tagged = 0
+    start = time.perf_counter()
+    buffer.edit(line, "```")
+    opened = time.perf_counter() - start
+    print(f"open a fence: {opened * 1e6:.0f}us for {buffer.tagged} line(s) on screen, "
+          f"{args.lines - line - buffer.tagged} left for idle time")
+
+    # Typing in a document just opened, below what idle time has tagged:
+    # only the lines from the edit on are tagged at once.
+    ahead = ListBuffer(lines[:args.lines])
+    ahead.highlighter.run(deadline=time.perf_counter() + 0.01)
+    frontier = ahead.highlighter.todo[0]
+    timings = []
+    for _ in range(args.keys):
+        line = rnd.randrange(frontier + VISIBLE_LINES, args.lines)
+        text = ahead.lines[line]
+        start = time.perf_counter()
+        ahead.edit(line, text + "x")
+        timings.append(time.perf_counter() - start)
+    ahead.tagged = 0
+    ahead.highlighter.run()
+    print(f"keystroke below line {frontier} before it is tagged: p50 {percentile(timings, 0.5) * 1e6:.0f}us  "
+          f"p99 {percentile(timings, 0.99) * 1e6:.0f}us, then {ahead.tagged} line(s) tagged in idle time")
+
+    start = time.perf_counter()
+    full = ListBuffer(buffer.lines)
+    full.highlighter.run()
+    print(f"full re-tag per key: {(time.perf_counter() - start) * 1000:.0f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
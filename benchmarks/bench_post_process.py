@@ -0,0 +1,152 @@
+# Benchmark for remapping tags of serialized HTML.
+#
+# Compares the old chained replace/re.sub passes with the single-pass
+# TagRemapper on synthetic documents of 10 KB, 1 MB and 10 MB and prints the
+# time per conversion for each.
+#
+#     python benchmarks/bench_post_process.py [--repeat N] [--sizes 10K,1M,10M]
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown
+
+from corpus import make_sections, parse_size
+
+STYLE_MAPPING = {
+    "bold": "b",
+    "italic": "i",
+    "code": "code",
+    "h1": "h2",
+    "h2": "h3",
+    "h3": "h4",
+    "h4": "h4",
+    "h5": "h5",
+    "h6": "h6",
+    "br": "br",
+    "p": 'p class="post"',
+    "blockquote": 'blockquote class="quote"'
+}
+
+
+class TagRemapper:
+    # Rewrites every mapped open/close tag of an HTML string in a single scan.
+    # The converter renames elements on the tree instead; this is the string
+    # remapper it replaced, compared here with the chained passes before it.
+    # Each distinct tag token is rewritten once, by the same ordered rules the
+    # old chained passes applied to the whole document, and then memoised, so
+    # the output is identical to running those passes one after another.
+    TOKEN_RE = re.compile(r"</?(?:strong|em|code|h[1-6]|br|p|blockquote)[^>]*>")
+    MAX_MEMO = 4096
+
+    def __init__(self, style_mapping):
+        self.rules = []
+        # Bold, italic and code only ever matched the bare tags.
+        for key, default_tag in (("bold", "strong"), ("italic", "em"), ("code", "code")):
+            custom_tag = style_mapping.get(key, default_tag)
+            self.rules.append((f"<{default_tag}>", f"<{custom_tag}>"))
+            self.rules.append((f"</{default_tag}>", f"</{custom_tag}>"))
+        for i in range(1, 7):
+            default_tag = f"h{i}"
+            custom_tag = style_mapping.get(f"h{i}", default_tag)
+            self.rules.append((re.compile(rf"<{default_tag}(\s*[^>]*)>"), rf"<{custom_tag}\1>"))
+            self.rules.append((re.compile(rf"</{default_tag}>"), rf"</{custom_tag}>"))
+        br_tag = style_mapping.get("br", "br")
+        self.rules.append((re.compile(r"<br\s*/?>"), f"<{br_tag}>"))
+        # Paragraph and blockquote tags may carry attributes ("p class=...").
+        for key in ("p", "blockquote"):
+            custom_tag = style_mapping.get(key, key)
+            tag_name = custom_tag.split()[0]
+            self.rules.append((re.compile(rf"<{key}(\s*[^>]*)>"), rf"<{custom_tag}\1>"))
+            self.rules.append((re.compile(rf"</{key}>"), rf"</{tag_name}>"))
+        self.memo = {}
+
+    def rewrite_token(self, token):
+        for pattern, replacement in self.rules:
+            if isinstance(pattern, str):
+                token = token.replace(pattern, replacement)
+            else:
+                token = pattern.sub(replacement, token)
+        return token
+
+    def replace_match(self, match):
+        token = match.group()
+        try:
+            return self.memo[token]
+        except KeyError:
+            pass
+        if len(self.memo) >= self.MAX_MEMO:
+            self.memo.clear()
+        rewritten = self.memo[token] = self.rewrite_token(token)
+        return rewritten
+
+    def remap(self, html):
+        return self.TOKEN_RE.sub(self.replace_match, html)
+
+
+def legacy_post_process(style_mapping, html):
+    # The chained passes the editor used before TagRemapper.
+    bold_tag = style_mapping.get("bold", "strong")
+    html = html.replace("<strong>", f"<{bold_tag}>").replace("</strong>", f"</{bold_tag}>")
+    italic_tag = style_mapping.get("italic", "em")
+    html = html.replace("<em>", f"<{italic_tag}>").replace("</em>", f"</{italic_tag}>")
+    code_tag = style_mapping.get("code", "code")
+    html = html.replace("<code>", f"<{code_tag}>").replace("</code>", f"</{code_tag}>")
+    for i in range(1, 7):
+        default_tag = f"h{i}"
+        custom_tag = style_mapping.get(f"h{i}", default_tag)
+        html = re.sub(rf"<{default_tag}(\s*[^>]*)>", rf"<{custom_tag}\1>", html)
+        html = re.sub(rf"</{default_tag}>", rf"</{custom_tag}>", html)
+    br_tag = style_mapping.get("br", "br")
+    html = re.sub(r'<br\s*/?>', f"<{br_tag}>", html)
+    custom_p = style_mapping.get("p", "p")
+    p_tag_name = custom_p.split()[0]
+    html = re.sub(r"<p(\s*[^>]*)>", rf"<{custom_p}\1>", html)
+    html = re.sub(r"</p>", rf"</{p_tag_name}>", html)
+    custom_bq = style_mapping.get("blockquote", "blockquote")
+    bq_tag_name = custom_bq.split()[0]
+    html = re.sub(r"<blockquote(\s*[^>]*)>", rf"<{custom_bq}\1>", html)
+    html = re.sub(r"</blockquote>", rf"</{bq_tag_name}>", html)
+    return html
+
+
+def make_html(size):
+    # Render a few sections and repeat them, so that 10 MB documents do not spend
+    # minutes in markdown before the interesting part starts.
+    section_md = make_sections(4096)
+    section_html = markdown.markdown(section_md, extensions=['extra', 'nl2br']) + "\n"
+    return section_html * max(1, size // len(section_html))
+
+
+def best_of(func, html, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(html)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tag remapping of serialized HTML.")
+    parser.add_argument("--sizes", default="10K,1M,10M")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    remapper = TagRemapper(STYLE_MAPPING)
+    print(f"{'size':>8} {'chained':>12} {'single-pass':>12} {'speedup':>8}")
+    for size_text in args.sizes.split(","):
+        html = make_html(parse_size(size_text))
+        assert remapper.remap(html) == legacy_post_process(STYLE_MAPPING, html)
+        old = best_of(lambda h: legacy_post_process(STYLE_MAPPING, h), html, args.repeat)
+        new = best_of(remapper.remap, html, args.repeat)
+        print(f"{size_text:>8} {old * 1000:>10.2f}ms {new * 1000:>10.2f}ms {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Startup benchmark: time to import the conversion core headless, and time
+# from process start to the first painted editor window. Each run is a fresh
+# interpreter; imports are timed with "python -X importtime". Exits non-zero
+# if a budget is exceeded or if the headless import loads a GUI module. The
+# paint check is skipped when there is no display.
+#
+#     python benchmarks/bench_startup.py [--runs 5] [--import-budget-ms 250] [--paint-budget-ms 1500]
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GUI_MODULES = ("tkinter", "ttkbootstrap", "tkhtmlview", "PIL")
+IMPORTTIME_RE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)$")
+
+# Runs in the child: builds the editor window, paints it once and exits.
+# Exits 3 when there is no display.
+PAINT_SCRIPT = """
+import sys
+import tkinter as tk
+import ttkbootstrap as ttk
+from md2html_gui import CustomMD2HTML
+try:
+    root = ttk.Window(themename="flatly")
+except tk.TclError:
+    sys.exit(3)
+app = CustomMD2HTML(root)
+root.update()
+root.destroy()
+"""
+
+
+def import_times(module):
+    # Returns ({name: cumulative microseconds} for module and everything it
+    # imported, wall ms). Interpreter startup imports (site) are left out.
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    wall = (time.perf_counter() - start) * 1000
+    times = {}
+    subtree = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        subtree[match.group(3)] = int(match.group(1))
+        # Children are listed before their parent; one space marks a top-level import.
+        if len(match.group(2)) == 1:
+            if match.group(3) == module:
+                times = subtree
+            subtree = {}
+    return times, wall
+
+
+def first_paint():
+    # Milliseconds from launching the interpreter to the first painted window,
+    # or None without a display.
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", PAINT_SCRIPT], cwd=ROOT,
+                            capture_output=True, text=True)
+    elapsed = (time.perf_counter() - start) * 1000
+    if result.returncode == 3:
+        return None
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark headless import and first GUI paint.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=250.0)
+    parser.add_argument("--paint-budget-ms", type=float, default=1500.0)
+    args = parser.parse_args()
+    failed = False
+
+    for module in ("md2html_core", "custommd2html"):
+        results = [import_times(module) for _ in range(args.runs)]
+        loaded = results[0][0]
+        gui = sorted(name for name in loaded if name.split(".")[0] in GUI_MODULES)
+        import_ms = min(times.get(module, 0) for times, wall in results) / 1000
+        wall_ms = min(wall for times, wall in results)
+        print(f"import {module}: {import_ms:.1f}ms (interpreter wall {wall_ms:.1f}ms)")
+        heaviest = sorted(loaded.items(), key=lambda item: item[1], reverse=True)[1:6]
+        for name, micros in heaviest:
+            print(f"    {name:<40} {micros / 1000:>7.1f}ms")
+        if gui:
+            print(f"FAIL: headless import of {module} loaded {', '.join(gui)}")
+            failed = True
+        if import_ms > args.import_budget_ms:
+            print(f"FAIL: import {module} over budget ({args.import_budget_ms:.0f}ms)")
+            failed = True
+
+    paints = [first_paint() for _ in range(args.runs)]
+    if None in paints:
+        print("first paint: skipped (no display)")
+    else:
+        paint_ms = min(paints)
+        print(f"first paint: {paint_ms:.1f}ms")
+        if paint_ms > args.paint_budget_ms:
+            print(f"FAIL: first paint over budget ({args.paint_budget_ms:.0f}ms)")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# Peak memory of exporting a large Markdown file to HTML: convert_file, which
+# streams the file in segments, against reading, converting and writing the
+# whole document at once. Each export runs in a child process; its peak is how
+# far the child's maximum resident set size grew during the export, which
+# costs nothing to measure (tracemalloc slowed a 50 MB export down to more
+# than a quarter of an hour). The whole-document export takes superlinear
+# time, so it runs on a smaller input (--baseline-size), which is also
+# streamed and the two outputs compared. Exits non-zero if the streamed
+# export exceeds the budget or the outputs differ.
+#
+#     python benchmarks/bench_stream_memory.py [--size 50M] [--corpus code] [--budget-mb 64]
+#                                              [--baseline-size 4M | --no-baseline]
+import argparse
+import filecmp
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import CORPORA, make_corpus, make_sections, parse_size
+from md2html_core import MarkdownConverter, convert_file
+
+# ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+MAXRSS_BYTES = 1 if sys.platform == "darwin" else 1024
+
+
+def peak_rss():
+    # High-water mark of the resident set size in bytes. Linux carries
+    # ru_maxrss over exec, so it would include the peak of the parent that
+    # forked the child; VmHWM starts anew.
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * MAXRSS_BYTES
+
+
+def whole_file_export(src_path, out_path, converter):
+    with open(src_path, "r", encoding="utf-8") as f:
+        md_content = f.read()
+    html_content = converter.convert(md_content)
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(html_content)
+
+
+def run_export(mode, src_path, out_path):
+    # In the child: export and print {"peak": MB, "seconds": s}.
+    export = convert_file if mode == "stream" else whole_file_export
+    converter = MarkdownConverter({})
+    before = peak_rss()
+    start = time.perf_counter()
+    export(src_path, out_path, converter)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss() - before
+    print(json.dumps({"peak": peak / (1024 * 1024), "seconds": elapsed}))
+
+
+def measure(mode, src_path, out_path):
+    # Returns (peak MB, seconds) of an export in a child process.
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--export", mode, src_path, out_path],
+                            capture_output=True, text=True, check=True)
+    measured = json.loads(result.stdout)
+    return measured["peak"], measured["seconds"]
+
+
+def write_input(path, corpus, size):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(make_corpus(corpus, size) if corpus else make_sections(size))
+    print(f"input: {os.path.getsize(path) / (1024 * 1024):.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure peak memory of HTML export.")
+    parser.add_argument("--size", default="50M")
+    parser.add_argument("--corpus", choices=sorted(CORPORA),
+                        help="export a corpus of corpus.py instead of repeated sections")
+    parser.add_argument("--budget-mb", type=float, default=64.0)
+    parser.add_argument("--baseline-size", default="4M",
+                        help="input size of the whole-document export and the output comparison")
+    parser.add_argument("--no-baseline", action="store_true",
+                        help="skip the whole-document export")
+    parser.add_argument("--export", nargs=3, metavar=("MODE", "SRC", "OUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.export:
+        run_export(*args.export)
+        return 0
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_path = os.path.join(tmp_dir, "input.md")
+        write_input(src_path, args.corpus, parse_size(args.size))
+        streamed_path = os.path.join(tmp_dir, "streamed.html")
+        peak, elapsed = measure("stream", src_path, streamed_path)
+        print(f"streamed export: peak {peak:8.1f} MB in {elapsed:.1f}s")
+        if peak > args.budget_mb:
+            print(f"FAIL: streamed export over budget ({args.budget_mb:.0f} MB)")
+            failed = True
+
+        if not args.no_baseline:
+            write_input(src_path, args.corpus, parse_size(args.baseline_size))
+            peak, elapsed = measure("stream", src_path, streamed_path)
+            print(f"streamed export: peak {peak:8.1f} MB in {elapsed:.1f}s")
+            whole_path = os.path.join(tmp_dir, "whole.html")
+            peak, elapsed = measure("whole", src_path, whole_path)
+            print(f"whole export:    peak {peak:8.1f} MB in {elapsed:.1f}s")
+            if not filecmp.cmp(streamed_path, whole_path, shallow=False):
+                print("FAIL: streamed output differs from whole-document conversion")
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+# Overhead of the render pipeline instrumentation: cost of one traced stage
+# with tracing off and on, against the conversion it wraps.
+#
+#     python benchmarks/bench_trace_overhead.py [--stages 200000]
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import make_corpus
+from md2html_core import MarkdownConverter
+from md2html_trace import Tracer
+
+
+def per_stage(tracer, stages):
+    start = time.perf_counter()
+    for _ in range(stages):
+        with tracer.stage("convert", 100) as stage:
+            stage.set_output(100)
+    return (time.perf_counter() - start) / stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure tracing overhead.")
+    parser.add_argument("--stages", type=int, default=200000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for _ in range(args.stages):
+        pass
+    loop = (time.perf_counter() - start) / args.stages
+    disabled = per_stage(Tracer(enabled=False), args.stages) - loop
+    enabled = per_stage(Tracer(enabled=True), args.stages) - loop
+
+    converter = MarkdownConverter({})
+    md_content = make_corpus("blog", 10 * 1024)
+    start = time.perf_counter()
+    converter.convert(md_content)
+    convert = time.perf_counter() - start
+
+    print(f"traced stage, tracing off: {disabled * 1e9:8.0f}ns")
+    print(f"traced stage, tracing on:  {enabled * 1e9:8.0f}ns")
+    print(f"10 KB blog post conversion: {convert * 1e6:8.0f}us "
+          f"(6 stages off = {6 * disabled / convert * 100:.4f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
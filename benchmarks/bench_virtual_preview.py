@@ -0,0 +1,65 @@
+# Benchmark for the rendered preview on large documents: a plain HTMLLabel
+# that lays out the whole document against VirtualHTMLPreview, which only
+# lays out the blocks around the viewport. Times the first paint and a jump
+# to the middle of the document. Needs a display.
+#
+#     python benchmarks/bench_virtual_preview.py [--sizes 200K,1M,5M]
+import argparse
+import os
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tkhtmlview import HTMLLabel
+
+from corpus import make_sections, parse_size
+from md2html_core import MarkdownConverter
+from md2html_gui import VirtualHTMLPreview
+
+
+def timed(root, func):
+    start = time.perf_counter()
+    func()
+    root.update()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the virtualized preview.")
+    parser.add_argument("--sizes", default="200K,1M,5M")
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"This benchmark needs a display: {e}", file=sys.stderr)
+        return 1
+    root.geometry("800x600")
+    converter = MarkdownConverter({})
+
+    print(f"{'size':>8} {'full paint':>12} {'full jump':>12} {'virt paint':>12} {'virt jump':>12}")
+    for size_text in args.sizes.split(","):
+        html = converter.convert(make_sections(parse_size(size_text)))
+
+        label = HTMLLabel(root, html="")
+        label.pack(expand=True, fill="both")
+        full_paint = timed(root, lambda: label.set_html(html))
+        full_jump = timed(root, lambda: label.yview_moveto(0.5))
+        label.destroy()
+
+        preview = VirtualHTMLPreview(root)
+        preview.pack(expand=True, fill="both")
+        virtual_paint = timed(root, lambda: preview.set_html(html))
+        virtual_jump = timed(root, lambda: preview.moveto(0.5))
+        preview.destroy()
+
+        print(f"{size_text:>8} {full_paint * 1000:>10.1f}ms {full_jump * 1000:>10.1f}ms "
+              f"{virtual_paint * 1000:>10.1f}ms {virtual_jump * 1000:>10.1f}ms")
+    root.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# Benchmark for watch mode: latency from saving one file to its rebuilt HTML
+# on a large tree. Starts "custommd2html.py watch" on a generated tree, edits
+# random files one at a time and waits for each output to change. Exits
+# non-zero if the median latency exceeds the budget.
+#
+#     python benchmarks/bench_watch.py [--files 8000] [--edits 20] [--budget-ms 50] [--poll]
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+POST = """# Post {n}
+
+Some **bold** text, some *italic* text and a bit of `code`.
+
+> A quote
+
+- first item
+- second item
+"""
+
+
+def make_tree(src_dir, files, per_dir=80):
+    paths = []
+    for n in range(files):
+        directory = os.path.join(src_dir, f"section{n // per_dir:03d}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"post{n:05d}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(POST.format(n=n))
+        paths.append(path)
+    return paths
+
+
+def wait_for_line(process, prefix, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        line = process.stdout.readline()
+        if not line:
+            break
+        if line.startswith(prefix):
+            return line
+    raise RuntimeError(f"watch did not print {prefix!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark watch mode rebuild latency.")
+    parser.add_argument("--files", type=int, default=8000)
+    parser.add_argument("--edits", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    parser.add_argument("--poll", action="store_true", help="benchmark the polling fallback")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_dir = os.path.join(tmp_dir, "src")
+        out_dir = os.path.join(tmp_dir, "out")
+        paths = make_tree(src_dir, args.files)
+        command = [sys.executable, os.path.join(ROOT, "custommd2html.py"), "watch", src_dir, out_dir,
+                   "--config", os.path.join(tmp_dir, "config.json")]
+        if args.poll:
+            command.append("--poll")
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+        try:
+            print(wait_for_line(process, "Watching", 600).strip())
+            print(f"initial build: {time.perf_counter() - start:.1f}s")
+            latencies = []
+            for edit in range(args.edits):
+                path = rnd.choice(paths)
+                out_path = os.path.join(out_dir, os.path.relpath(path, src_dir))[:-3] + ".html"
+                before = os.stat(out_path).st_mtime_ns
+                time.sleep(0.1)
+                start = time.perf_counter()
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(f"\nEdit {edit}.\n")
+                while os.stat(out_path).st_mtime_ns == before:
+                    if time.perf_counter() - start > 10:
+                        raise RuntimeError(f"{out_path} was not rebuilt")
+                    time.sleep(0.0005)
+                latencies.append((time.perf_counter() - start) * 1000)
+                wait_for_line(process, "Rendered", 10)
+        finally:
+            process.terminate()
+            process.wait()
+    median = statistics.median(latencies)
+    print(f"save-to-output latency over {args.edits} edits: median {median:.1f}ms, "
+          f"max {max(latencies):.1f}ms")
+    if median > args.budget_ms:
+        print(f"FAIL: median latency over budget ({args.budget_ms:.0f}ms)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
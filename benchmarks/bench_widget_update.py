@@ -0,0 +1,86 @@
+# Benchmark for preview widget updates after a one character edit: the old
+# full delete/insert and set_html against CustomMD2HTML.update_html_text
+# (changed lines only) and update_html_view (skipped when unchanged).
+# Needs a display.
+#
+#     python benchmarks/bench_widget_update.py [--sizes 50K,200K,1M]
+import argparse
+import os
+import sys
+import time
+import tkinter as tk
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tkhtmlview import HTMLLabel
+
+from corpus import make_sections, parse_size
+from md2html_core import MarkdownConverter
+from md2html_gui import CustomMD2HTML
+from md2html_trace import Tracer
+
+
+def timed(root, func):
+    start = time.perf_counter()
+    func()
+    root.update_idletasks()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark preview widget updates.")
+    parser.add_argument("--sizes", default="50K,200K,1M")
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"This benchmark needs a display: {e}", file=sys.stderr)
+        return 1
+    html_text = tk.Text(root)
+    html_text.pack()
+    html_view = HTMLLabel(root, html="")
+    html_view.pack()
+    converter = MarkdownConverter({})
+
+    print(f"{'size':>8} {'text full':>11} {'text diff':>11} {'view full':>11} {'view same':>11}")
+    for size_text in args.sizes.split(","):
+        md_content = make_sections(parse_size(size_text))
+        middle = md_content.index("Some", len(md_content) // 2)
+        old_html = converter.convert(md_content)
+        new_html = converter.convert(md_content[:middle] + "X" + md_content[middle + 1:])
+
+        def full_text_update():
+            html_text.delete("1.0", "end")
+            html_text.insert("1.0", new_html)
+
+        def full_view_update():
+            html_view.set_html(new_html)
+            html_view.fit_height()
+
+        # Old behaviour: everything is replaced on every render.
+        html_text.delete("1.0", "end")
+        html_text.insert("1.0", old_html)
+        text_full = timed(root, full_text_update)
+        html_view.set_html(old_html)
+        view_full = timed(root, full_view_update)
+
+        # New behaviour, through the editor's own update methods.
+        app = SimpleNamespace(tracer=Tracer())
+        doc = SimpleNamespace(html_text=html_text, html_view=html_view, view_position=None,
+                              html_text_content=None, html_view_content=None)
+        CustomMD2HTML.update_html_text(app, doc, old_html)
+        text_diff = timed(root, lambda: CustomMD2HTML.update_html_text(app, doc, new_html))
+        assert html_text.get("1.0", "end-1c") == new_html
+        CustomMD2HTML.update_html_view(app, doc, new_html)
+        view_same = timed(root, lambda: CustomMD2HTML.update_html_view(app, doc, new_html))
+
+        print(f"{size_text:>8} {text_full * 1000:>9.1f}ms {text_diff * 1000:>9.1f}ms "
+              f"{view_full * 1000:>9.1f}ms {view_same * 1000:>9.2f}ms")
+    root.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
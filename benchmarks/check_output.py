@@ -0,0 +1,55 @@
+# Output check for MarkdownConverter: converts small documents with a given
+# style mapping and fails if the HTML differs from what the editor produced
+# before the style mapping moved onto the Markdown tree.
+#
+#     python benchmarks/check_output.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from md2html_core import MarkdownConverter, check_style_mapping
+
+# (style mapping, Markdown, expected HTML)
+CASES = [
+    # Attributes whose value equals their name keep the value.
+    ({}, "# Title {#id}", '<h1 id="id">Title</h1>'),
+    ({}, '![alt](a.png "title")', '<p><img alt="alt" src="a.png" title="title" /></p>'),
+    ({}, '[alt](a.html "title")', '<p><a href="a.html" title="title">alt</a></p>'),
+    # Line breaks are "<br>", other void elements keep the xhtml form.
+    ({}, "a\nb\n\n---", "<p>a<br>\nb</p>\n<hr />"),
+    ({"br": 'br class="x"'}, "a\nb", '<p>a<br class="x">\nb</p>'),
+    # A trailing "/" of a configured tag is dropped.
+    ({"br": "br/"}, "a\nb", "<p>a<br>\nb</p>"),
+    ({"bold": "b /", "p": 'p class="x"/'}, "**a**", '<p class="x"><b>a</b></p>'),
+    # "code" maps inline code, not code blocks.
+    ({"code": "kbd"}, "`a`\n\n    b\n\n```\nc\n```",
+     "<p><kbd>a</kbd></p>\n<pre><code>b\n</code></pre>\n<pre><code>c\n</code></pre>"),
+]
+# Style mappings check_style_mapping must reject.
+INVALID_MAPPINGS = [
+    {"bold": "<b>"}, {"br": "/"}, {"p": "1p"}, {"p": 'p "class"="x"'}, {"h1": 1},
+]
+
+
+def main():
+    failures = 0
+    for style_mapping, md_content, expected in CASES:
+        html = MarkdownConverter(style_mapping).convert(md_content)
+        if html != expected:
+            failures += 1
+            print(f"Mismatch for {md_content!r} with {style_mapping}\n"
+                  f"  expected: {expected!r}\n  actual:   {html!r}")
+    for style_mapping in INVALID_MAPPINGS:
+        try:
+            check_style_mapping(style_mapping)
+        except ValueError:
+            continue
+        failures += 1
+        print(f"Accepted invalid style mapping {style_mapping}")
+    print(f"{failures} mismatch(es) in {len(CASES) + len(INVALID_MAPPINGS)} case(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
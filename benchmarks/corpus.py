@@ -0,0 +1,160 @@
+# Synthetic Markdown corpora for the benchmarks. Every generator is seeded,
+# so a (kind, size, seed) triple always gives the same document.
+import random
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog markdown html render preview editor tag style "
+    "mapping blog post draft config widget cache block quote heading table footnote code line "
+    "text paragraph list item link image bold italic convert output input file save open"
+).split()
+LANGUAGES = ["python", "js", "bash", "", "html"]
+
+
+def sentence(rnd, low=4, high=14):
+    words = [rnd.choice(WORDS) for _ in range(rnd.randint(low, high))]
+    words[0] = words[0].capitalize()
+    return " ".join(words) + "."
+
+
+def inline_text(rnd, sentences=3):
+    # Prose with the inline markup the style mapping applies to.
+    parts = []
+    for _ in range(sentences):
+        text = sentence(rnd)
+        roll = rnd.random()
+        if roll < 0.2:
+            text = f"**{text}**"
+        elif roll < 0.35:
+            text = f"*{text}*"
+        elif roll < 0.45:
+            text = f"{text} Run `{rnd.choice(WORDS)}()` first."
+        elif roll < 0.5:
+            text = f"{text} See [{rnd.choice(WORDS)}](https://example.com/{rnd.choice(WORDS)})."
+        parts.append(text)
+    return " ".join(parts)
+
+
+def heading_section(rnd, n):
+    return f"{'#' * rnd.randint(1, 6)} {sentence(rnd, 2, 6)[:-1]}\n\n{inline_text(rnd, 1)}\n\n"
+
+
+def blockquote_section(rnd, n):
+    lines = []
+    for _ in range(rnd.randint(2, 6)):
+        # Tab-indented quotes exercise the "\t>" normalization.
+        prefix = rnd.choice(["> ", "> ", ">> ", "\t> ", "> > "])
+        lines.append(prefix + inline_text(rnd, 1))
+    return "\n".join(lines) + "\n\n"
+
+
+def code_section(rnd, n):
+    roll = rnd.random()
+    body = "\n".join(f"{rnd.choice(WORDS)} = {rnd.choice(WORDS)}({n}, '<{rnd.choice(WORDS)}>')"
+                     for _ in range(rnd.randint(3, 12)))
+    if roll < 0.6:
+        return f"```{rnd.choice(LANGUAGES)}\n{body}\n```\n\n"
+    if roll < 0.8:
+        return "\n".join("    " + line for line in body.split("\n")) + "\n\n"
+    return f"{inline_text(rnd, 1)} Use `{rnd.choice(WORDS)} --{rnd.choice(WORDS)}` to run it.\n\n"
+
+
+def extra_section(rnd, n):
+    roll = rnd.random()
+    if roll < 0.4:
+        rows = "\n".join(f"| {rnd.choice(WORDS)} | {rnd.randint(0, 999)} | *{rnd.choice(WORDS)}* |"
+                         for _ in range(rnd.randint(2, 8)))
+        return f"| name | value | note |\n|---|--:|:-:|\n{rows}\n\n"
+    if roll < 0.7:
+        return f"{inline_text(rnd, 1)}[^n{n}]\n\n[^n{n}]: {sentence(rnd)}\n\n"
+    if roll < 0.85:
+        return f"{rnd.choice(WORDS).capitalize()}\n:   {sentence(rnd)}\n\n"
+    return f"*[HTML{n}]: Hyper Text {n}\n\nHTML{n} {inline_text(rnd, 1)}\n{{: .note }}\n\n"
+
+
+def blog_section(rnd, n):
+    # Mostly prose, with the occasional list, quote, code block and table.
+    roll = rnd.random()
+    if roll < 0.1:
+        return heading_section(rnd, n)
+    if roll < 0.5:
+        return inline_text(rnd, rnd.randint(2, 5)) + "\n" + inline_text(rnd, 2) + "\n\n"
+    if roll < 0.65:
+        marker = rnd.choice(["-", "*", "1."])
+        return "\n".join(f"{marker} {inline_text(rnd, 1)}" for _ in range(rnd.randint(2, 6))) + "\n\n"
+    if roll < 0.75:
+        return blockquote_section(rnd, n)
+    if roll < 0.85:
+        return code_section(rnd, n)
+    if roll < 0.9:
+        return f"![{rnd.choice(WORDS)}](images/{n}.png)\n\n"
+    if roll < 0.95:
+        return extra_section(rnd, n)
+    return "---\n\n"
+
+
+CORPORA = {
+    "heading": heading_section,
+    "blockquote": blockquote_section,
+    "code": code_section,
+    "extra": extra_section,
+    "blog": blog_section,
+}
+
+
+def parse_size(text):
+    units = {"K": 1024, "M": 1024 * 1024}
+    if text[-1].upper() in units:
+        return int(float(text[:-1]) * units[text[-1].upper()])
+    return int(text)
+
+
+def make_corpus(kind, size, seed=0):
+    # A document of kind with at least size characters.
+    rnd = random.Random(f"{kind}:{size}:{seed}")
+    section = CORPORA[kind]
+    parts = []
+    total = 0
+    n = 0
+    while total < size:
+        parts.append(section(rnd, n))
+        total += len(parts[-1])
+        n += 1
+    return "".join(parts)
+
+
+# A section using every element of the style mapping, for benchmarks that
+# want the same document shape at every size.
+SECTION = """## Section {n}
+
+Some **bold** text, some *italic* text and a bit of `code`.
+A second line that nl2br turns into a break.
+
+> A quote with **emphasis**
+> spanning two lines.
+
+### Sub heading {n}
+
+- first item
+- second item
+
+```python
+print("hello {n}")
+```
+
+| a | b |
+|---|---|
+| {n} | x |
+
+"""
+
+
+def make_sections(size):
+    # Numbered copies of SECTION, at least size characters in all.
+    parts = []
+    total = 0
+    n = 0
+    while total < size:
+        parts.append(SECTION.format(n=n))
+        total += len(parts[-1])
+        n += 1
+    return "".join(parts)
@@ -0,0 +1,118 @@
+# Fuzz check for BlockRenderer and stream_convert: renders random documents
+# block by block, streamed from a file in small segments, and as a whole, and
+# fails if the output differs by a single byte. Each document is then edited
+# a few times and rendered again, block by block and as a whole.
+#
+#     python benchmarks/fuzz_block_render.py [--iterations N] [--seed S]
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from md2html_core import BlockRenderer, MarkdownConverter, split_markdown_blocks, stream_convert
+
+# Whole constructs, joined with varying blank lines.
+FRAGMENTS = [
+    "# Heading *x*", "Setext\n===", "para **b** *i* `c`\nline2", "> quote\n>\n> more",
+    "\t> tab quote", "```python\nx = 1\n\n\ny\n```", "~~~\n```\n~~~", "```{.py #a}\nq\n```",
+    "```{a}}\nz\n\n```", "```\nunterminated", "    code\n\n    more",
+    "| a | b |\n|---|---|\n| 1 | 2 |", "- a\n- b", "1. one\n2. two", "- item\n\n    para in item",
+    "* * *", "---", "Term\n: def", "Term\n\n: def2", "<div>\n\nraw\n\n</div>", "text <span>x</span>",
+    "  two-space", "\tindented tab", "  \t  ", "", "*a\n\nb*", "[link](http://x)", "![img](y.png)",
+    "## H {: #id }", "para\n{: .cls }", "&amp; &copy; &#", "\\*escaped", "***bold it***", ">",
+    "1986\\. year", "<!-- comment -->", "a  \nb", "[ref]\n\n[ref]: http://x", "note[^1]\n\n[^1]: text",
+    "*[HTML]: Hyper Text", "Use `List<int>` here", "a < b and c > d", "x <y and z", "&#169; &#x27; &#",
+    "<http://example.com> and <me@example.com>", "inline <b>bold</b> <br/>", "`<div>` in code",
+    "text <!-- note --> more", "half <!-- open", "close -->", "end tag </span", "<hr>", "a <? b",
+    "[r]: http://r 'T'", "[r] and [R][]", "> [q]: http://q\n>\n> [q]", "- [l]: http://l\n\n    [l]",
+    "Title\n[t]: http://t\n[t]",
+]
+# Markdown-significant tokens, joined into random lines.
+TOKENS = [
+    "#", "##", " ", "  ", "    ", "\t", "-", "*", "+", "1.", "2)", ">", "```", "~~~", ":", "|", "---",
+    "===", "**", "_", "`", "<div>", "</div>", "<p>", "(b)", "word", "x", "\\", "&", "&#", "{: .c}",
+    "![i](p)", "<!--", "-->", "```py", "List<int>", "<int", "`", "<b>", "</b>", "</", "&#169;",
+    "<http://x>", "[r]", "[r]:", "http://r", "[q]: /q",
+]
+
+# Fragments that do not make a document render as a whole.
+BLOCK_FRAGMENTS = [fragment for fragment in FRAGMENTS if split_markdown_blocks(fragment) is not None]
+
+
+def fragment_document(rnd):
+    return "".join(rnd.choice(FRAGMENTS) + rnd.choice(["\n", "\n\n", "\n\n\n", "\n \n"])
+                   for _ in range(rnd.randint(1, 12)))
+
+
+def token_document(rnd):
+    lines = []
+    for _ in range(rnd.randint(1, 25)):
+        if rnd.random() < 0.25:
+            lines.append("")
+        else:
+            lines.append("".join(rnd.choice(TOKENS) + rnd.choice(["", " "])
+                                 for _ in range(rnd.randint(1, 5))))
+    return "\n".join(lines)
+
+
+def block_document(rnd):
+    # Many blocks, so that edits split only a few of them again.
+    return "".join(rnd.choice(BLOCK_FRAGMENTS) + rnd.choice(["\n\n", "\n\n\n", "\n \n"])
+                   for _ in range(rnd.randint(10, 40)))
+
+
+def edit_document(rnd, md_content):
+    # Replaces a few lines with random ones, or types a character.
+    lines = md_content.split("\n")
+    first = rnd.randrange(len(lines))
+    if rnd.random() < 0.5:
+        column = rnd.randint(0, len(lines[first]))
+        lines[first] = lines[first][:column] + rnd.choice(TOKENS + ["\n", "\n\n"]) + lines[first][column:]
+    else:
+        last = min(first + rnd.randint(0, 3), len(lines))
+        lines[first:last] = token_document(rnd).split("\n")[:rnd.randint(0, 3)]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare block-by-block and full renders.")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    converter = MarkdownConverter({})
+    renderer = BlockRenderer(MarkdownConverter({}))
+    failures = 0
+    renders = 0
+    fd, src_path = tempfile.mkstemp(suffix=".md")
+    os.close(fd)
+    for i in range(args.iterations):
+        md_content = (token_document, fragment_document, block_document)[i % 3](rnd)
+        expected = converter.convert(md_content)
+        actual = renderer.render(md_content)
+        with open(src_path, "w", encoding="utf-8") as f:
+            f.write(md_content)
+        out = io.StringIO()
+        stream_convert(src_path, out, converter, segment_size=rnd.randint(1, 64))
+        results = [(md_content, expected, "block", actual), (md_content, expected, "stream", out.getvalue())]
+        for _ in range(rnd.randint(1, 3)):
+            md_content = edit_document(rnd, md_content)
+            results.append((md_content, converter.convert(md_content), "edited", renderer.render(md_content)))
+        for md_content, expected, name, html in results:
+            renders += 1
+            if html != expected:
+                failures += 1
+                if failures <= 5:
+                    print(f"Mismatch for {md_content!r}\n  full:  {expected!r}\n  {name}: {html!r}")
+    os.unlink(src_path)
+    print(f"{failures} mismatch(es) in {renders} renders of {args.iterations} documents")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
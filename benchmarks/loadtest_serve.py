@@ -0,0 +1,135 @@
+# Load test for "custommd2html.py serve": concurrent keep-alive clients send
+# batches of blog posts for a fixed time and the client reports requests/s,
+# documents/s and latency percentiles. Starts its own server unless --url or
+# --unix points at a running one.
+#
+#     python benchmarks/loadtest_serve.py [--clients 8] [--batch 16] [--duration 10] [--size 4K]
+#     python benchmarks/loadtest_serve.py --url http://127.0.0.1:8765
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import make_corpus, parse_size
+
+
+async def open_connection(args):
+    if args.unix:
+        return await asyncio.open_unix_connection(args.unix)
+    url = urlsplit(args.url)
+    return await asyncio.open_connection(url.hostname, url.port or 80)
+
+
+async def post(reader, writer, body):
+    writer.write(f"POST /render HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def client(args, payloads, deadline, latencies, errors):
+    reader, writer = await open_connection(args)
+    index = 0
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, data = await post(reader, writer, payloads[index % len(payloads)])
+            latencies.append(time.perf_counter() - start)
+            if status != 200 or any("error" in result for result in json.loads(data)["results"]):
+                errors.append(status)
+            index += 1
+    finally:
+        writer.close()
+
+
+async def load(args, payloads):
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(client(args, payloads, deadline, latencies, errors) for _ in range(args.clients)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def make_payloads(args):
+    payloads = []
+    for n in range(8):
+        documents = [make_corpus("blog", parse_size(args.size), seed=n * args.batch + i) for i in range(args.batch)]
+        payload = {"documents": documents}
+        if args.override and n % 2:
+            # Every other request overrides the mapping, exercising the cache.
+            payload["style_mapping"] = {"bold": "b", "p": 'p class="post"'}
+        payloads.append(json.dumps(payload).encode("utf-8"))
+    return payloads
+
+
+def start_server(args, tmp_dir):
+    args.unix = os.path.join(tmp_dir, "serve.sock")
+    command = [sys.executable, os.path.join(ROOT, "custommd2html.py"), "serve", "--unix", args.unix,
+               "--config", os.path.join(tmp_dir, "config.json")]
+    if args.jobs:
+        command += ["-j", str(args.jobs)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("Serving"):
+        process.kill()
+        raise RuntimeError("server did not start")
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the render server.")
+    parser.add_argument("--url", help="server to test, e.g. http://127.0.0.1:8765")
+    parser.add_argument("--unix", help="Unix socket of the server to test")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes of the spawned server")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=16, help="documents per request")
+    parser.add_argument("--size", default="4K", help="size of each document")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--override", action="store_true",
+                        help="send a style_mapping override with every other request")
+    args = parser.parse_args()
+
+    payloads = make_payloads(args)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        process = None if args.url or args.unix else start_server(args, tmp_dir)
+        try:
+            latencies, errors, elapsed = asyncio.run(load(args, payloads))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+    if not latencies:
+        print("No requests completed")
+        return 1
+    latencies.sort()
+    percentile = lambda q: latencies[round(q * (len(latencies) - 1))] * 1000
+    print(f"{len(latencies)} requests ({len(latencies) * args.batch} documents) in {elapsed:.1f}s "
+          f"from {args.clients} client(s), {len(errors)} error(s)")
+    print(f"throughput: {len(latencies) / elapsed:.1f} requests/s, "
+          f"{len(latencies) * args.batch / elapsed:.1f} documents/s")
+    print(f"latency: p50 {percentile(0.5):.1f}ms  p95 {percentile(0.95):.1f}ms  "
+          f"p99 {percentile(0.99):.1f}ms  max {latencies[-1] * 1000:.1f}ms  "
+          f"mean {statistics.mean(latencies) * 1000:.1f}ms")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+# Benchmark suite with a regression gate. "run" times, through the functions
+# the editor and the build use, conversion with a style mapping that renames
+# every element, config load/save, and opening, saving and exporting the
+# synthetic corpora of corpus.py, and writes the timings to a JSON file;
+# "compare" fails when a metric got slower than a baseline by more than a
+# threshold.
+#
+#     python benchmarks/suite.py run [--sizes 1K,10K,100K,1M] [--corpora blog,code] [-o results.json]
+#     python benchmarks/suite.py compare baseline.json results.json [--threshold 10]
+#
+# Sizes go up to 50M (--sizes 1K,1M,50M); documents above 1 MB are timed once.
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown
+
+from corpus import CORPORA, make_corpus, parse_size
+from md2html_core import (DEFAULT_CONFIG, MarkdownConverter, RenderCache, check_style_mapping, convert_file,
+                          read_config, write_atomic)
+
+# A mapping that renames every element, so the style mapping has work to do.
+STYLE_MAPPING = {
+    "bold": "b", "italic": "i", "code": "kbd", "h1": "h2", "h2": "h3", "h3": "h4", "h4": "h5",
+    "h5": "h6", "h6": "strong", "br": "br /", "p": 'p class="post"', "blockquote": "aside",
+}
+CONFIG_REPEAT = 200
+
+
+def best_of(repeat, func, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def open_file(path, cache):
+    # As opening a rendered file in the editor: read it and look its render
+    # up in the render cache.
+    with open(path, "r", encoding="utf-8") as f:
+        md_content = f.read()
+    return cache.get(cache.key(md_content, STYLE_MAPPING))
+
+
+def load_config(path):
+    # As CustomMD2HTML.load_config reads and checks it.
+    check_style_mapping(read_config(path).get("style_mapping", {}))
+
+
+def save_config(path, config):
+    # As CustomMD2HTML.save_config writes it.
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=4)
+
+
+def config_metrics(tmp_dir, repeat):
+    config_path = os.path.join(tmp_dir, "config.json")
+    config = dict(DEFAULT_CONFIG, style_mapping=STYLE_MAPPING)
+    save_config(config_path, config)
+    return {
+        "config/load": best_of(repeat, lambda: [load_config(config_path) for _ in range(CONFIG_REPEAT)])
+                       / CONFIG_REPEAT,
+        "config/save": best_of(repeat, lambda: [save_config(config_path, config) for _ in range(CONFIG_REPEAT)])
+                       / CONFIG_REPEAT,
+    }
+
+
+def corpus_metrics(kind, size_text, seed, repeat, tmp_dir, converter, cache):
+    size = parse_size(size_text)
+    if size > 1024 * 1024:
+        repeat = 1
+    md_content = make_corpus(kind, size, seed)
+    md_path = os.path.join(tmp_dir, "input.md")
+    html_path = os.path.join(tmp_dir, "output.html")
+    write_atomic(md_path, md_content)
+    cache.put(cache.key(md_content, STYLE_MAPPING), converter.convert(md_content))
+    name = f"{kind}/{size_text}"
+    return {
+        f"convert/{name}": best_of(repeat, converter.convert, md_content),
+        f"open/{name}": best_of(repeat, open_file, md_path, cache),
+        f"save/{name}": best_of(repeat, write_atomic, md_path, md_content),
+        f"export/{name}": best_of(repeat, convert_file, md_path, html_path, converter),
+    }
+
+
+def run(args):
+    kinds = args.corpora.split(",")
+    unknown = [kind for kind in kinds if kind not in CORPORA]
+    if unknown:
+        print(f"Unknown corpora: {', '.join(unknown)} (choose from {', '.join(CORPORA)})",
+              file=sys.stderr)
+        return 2
+    converter = MarkdownConverter(STYLE_MAPPING)
+    metrics = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = RenderCache(os.path.join(tmp_dir, "cache"))
+        metrics.update(config_metrics(tmp_dir, args.repeat))
+        for kind in kinds:
+            for size_text in args.sizes.split(","):
+                results = corpus_metrics(kind, size_text, args.seed, args.repeat, tmp_dir,
+                                         converter, cache)
+                for name, seconds in results.items():
+                    print(f"{name:<36} {seconds * 1000:>10.3f}ms", flush=True)
+                metrics.update(results)
+    results = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "markdown": markdown.__version__,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "metrics": metrics,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {len(metrics)} metric(s) to {args.output}")
+    return 0
+
+
+def compare(args):
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["metrics"]
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)["metrics"]
+    regressions = []
+    print(f"{'metric':<36} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name in sorted(set(baseline) | set(current)):
+        if name not in baseline or name not in current:
+            print(f"{name:<36} {'only in ' + ('current' if name in current else 'baseline'):>34}")
+            continue
+        old, new = baseline[name], current[name]
+        change = (new - old) / old * 100 if old else 0.0
+        flag = ""
+        # Timings below the noise floor are reported but never fail the gate.
+        if change > args.threshold and old >= args.min_seconds:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<36} {old * 1000:>10.3f}ms {new * 1000:>10.3f}ms {change:>+7.1f}%{flag}")
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:g}%")
+        return 1
+    print(f"No metric regressed by more than {args.threshold:g}%")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CustomMD2HTML benchmark suite.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="run the benchmarks and save the results")
+    run_parser.add_argument("--sizes", default="1K,10K,100K,1M")
+    run_parser.add_argument("--corpora", default=",".join(CORPORA))
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeat", type=int, default=5, help="best of N runs per metric")
+    run_parser.add_argument("-o", "--output", default="bench_results.json")
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=10.0,
+                                help="allowed slowdown in percent (default: %(default)s)")
+    compare_parser.add_argument("--min-seconds", type=float, default=0.0005,
+                                help="ignore metrics faster than this in the baseline (default: %(default)s)")
+    args = parser.parse_args()
+    if args.command == "run":
+        return run(args)
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
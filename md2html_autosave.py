@@ -0,0 +1,360 @@
+# Autosave and crash recovery for the editor. Each editor session keeps a
+# directory under RECOVERY_DIR holding a snapshot of the buffer and an
+# append-only journal of edits made since, so a checkpoint writes only the
+# changed span instead of the whole document:
+#
+#     session.json          {"path": file being edited or null, "pid": ..., "started": ...}
+#     snapshot.<gen>.md     the buffer at the start of generation gen
+#     journal.<gen>.jsonl   one record per checkpoint, either
+#                           {"l": first, "n": count, "t": text}: lines
+#                           [l, l + n) were replaced by the lines of t, or
+#                           {"s": start, "e": end, "t": text}: characters
+#                           [s, e) were replaced by t
+#
+# When the journal outgrows the snapshot, a new generation is written and the
+# old files removed; recovery reads the newest snapshot, so a crash part way
+# through leaves either generation complete. A session without a snapshot has
+# no unsaved changes. Sessions whose process has exited are offered for
+# recovery on the next start.
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import threading
+import queue
+
+from md2html_core import common_prefix_length, common_suffix_length, write_atomic
+
+RECOVERY_DIR = ".md2html_recovery"
+SESSION_FILE = "session.json"
+SNAPSHOT_RE = re.compile(r"snapshot\.(\d+)\.md$")
+# Journals are compacted into a new snapshot past this size, or past the
+# size of the snapshot if that is larger.
+COMPACT_MIN = 1024 * 1024
+
+
+def process_alive(pid):
+    if sys.platform == "win32":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == 259
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def snapshot_path(session_dir, generation):
+    return os.path.join(session_dir, f"snapshot.{generation}.md")
+
+
+def journal_path(session_dir, generation):
+    return os.path.join(session_dir, f"journal.{generation}.jsonl")
+
+
+def latest_generation(session_dir):
+    generations = [int(m.group(1)) for m in map(SNAPSHOT_RE.match, os.listdir(session_dir)) if m]
+    return max(generations) if generations else None
+
+
+def replay(session_dir):
+    # The buffer as of the last complete journal record, or None if the
+    # session has no unsaved changes. Line records are applied to a list of
+    # lines, character records to the text.
+    generation = latest_generation(session_dir)
+    if generation is None:
+        return None
+    with open(snapshot_path(session_dir, generation), "r", encoding="utf-8") as f:
+        text = f.read()
+    lines = None
+    try:
+        with open(journal_path(session_dir, generation), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    inserted = record["t"]
+                    if "l" in record:
+                        first, count = record["l"], record["n"]
+                    else:
+                        start, end = record["s"], record["e"]
+                except (ValueError, KeyError, TypeError):
+                    # A record cut short by a crash; nothing follows it.
+                    break
+                if "l" in record:
+                    if lines is None:
+                        lines = text.split("\n")
+                    if not 0 <= first <= first + count <= len(lines):
+                        break
+                    lines[first:first + count] = inserted.split("\n")
+                    continue
+                if lines is not None:
+                    text = "\n".join(lines)
+                    lines = None
+                if not 0 <= start <= end <= len(text):
+                    break
+                text = text[:start] + inserted + text[end:]
+    except FileNotFoundError:
+        pass
+    return text if lines is None else "\n".join(lines)
+
+
+def read_session(session_dir):
+    try:
+        with open(os.path.join(session_dir, SESSION_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def find_sessions(recovery_dir=RECOVERY_DIR):
+    # [(session_dir, info)] of sessions left with unsaved changes by editors
+    # that are no longer running, newest first. Those without unsaved changes
+    # are removed.
+    try:
+        names = os.listdir(recovery_dir)
+    except FileNotFoundError:
+        return []
+    sessions = []
+    for name in names:
+        session_dir = os.path.join(recovery_dir, name)
+        info = read_session(session_dir)
+        if info is None:
+            continue
+        pid = info.get("pid")
+        if pid == os.getpid() or (isinstance(pid, int) and pid > 0 and process_alive(pid)):
+            continue
+        if latest_generation(session_dir) is None:
+            shutil.rmtree(session_dir, ignore_errors=True)
+            continue
+        sessions.append((session_dir, info))
+    sessions.sort(key=lambda session: session[1].get("started", 0), reverse=True)
+    return sessions
+
+
+def discard_session(session_dir):
+    shutil.rmtree(session_dir, ignore_errors=True)
+
+
+class SessionJournal:
+    # Snapshot and journal of one session. Not thread-safe; the Autosaver
+    # drives it from its own thread.
+    def __init__(self, session_dir):
+        self.session_dir = session_dir
+        self.path = None
+        self.started = time.time()
+        self.generation = 0
+        # Buffer as of the last checkpoint or save, as a list of lines; None
+        # when it is not known.
+        self.lines = None
+        # Characters in the buffer, for deciding when to compact.
+        self.size = 0
+        # True while the snapshot and journal hold unsaved changes.
+        self.unsaved = False
+        self.journal = None
+        self.journal_size = 0
+
+    def write_session(self):
+        write_atomic(os.path.join(self.session_dir, SESSION_FILE),
+                     json.dumps({"path": self.path, "pid": os.getpid(), "started": self.started}))
+
+    def set_path(self, path):
+        if path != self.path:
+            self.path = path
+            if self.unsaved:
+                self.write_session()
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def forget(self):
+        # After a failed write: the next checkpoint needs the whole buffer.
+        self.close_journal()
+        self.lines = None
+
+    def reset(self, text):
+        # Start a new generation whose snapshot is text.
+        self.close_journal()
+        if not self.unsaved:
+            self.write_session()
+        old_generation = self.generation
+        self.generation += 1
+        write_atomic(snapshot_path(self.session_dir, self.generation), text)
+        for path in (snapshot_path(self.session_dir, old_generation),
+                     journal_path(self.session_dir, old_generation)):
+            if os.path.exists(path):
+                os.remove(path)
+        self.lines = text.split("\n")
+        self.size = len(text)
+        self.unsaved = True
+        self.journal_size = 0
+
+    def write_record(self, record):
+        # Appends record to the journal, or returns False if the journal is
+        # due for compaction into a new snapshot instead.
+        line = json.dumps(record) + "\n"
+        if self.journal_size + len(line) > max(COMPACT_MIN, self.size):
+            return False
+        if self.journal is None:
+            self.journal = open(journal_path(self.session_dir, self.generation), "a", encoding="utf-8")
+        self.journal.write(line)
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.journal_size += len(line)
+        return True
+
+    def append(self, text):
+        # Checkpoint of the whole buffer, journaled as the changed span.
+        if not self.unsaved or self.lines is None:
+            self.reset(text)
+            return
+        old_text = "\n".join(self.lines)
+        if text == old_text:
+            return
+        start = common_prefix_length(old_text, text)
+        suffix = common_suffix_length(old_text, text, min(len(old_text), len(text)) - start)
+        end = len(old_text) - suffix
+        self.size = len(text)
+        if not self.write_record({"s": start, "e": end, "t": text[start:len(text) - suffix]}):
+            self.reset(text)
+            return
+        self.lines = text.split("\n")
+
+    def replace_lines(self, first, count, text):
+        # Checkpoint of the lines [first, first + count) of the buffer, which
+        # were replaced by text. Returns False if the buffer is not known, in
+        # which case nothing is written.
+        if self.lines is None or first + count > len(self.lines):
+            return False
+        new_lines = text.split("\n")
+        old_lines = self.lines[first:first + count]
+        if new_lines == old_lines:
+            return True
+        self.lines[first:first + count] = new_lines
+        self.size += len(text) - len("\n".join(old_lines))
+        if not self.unsaved or not self.write_record({"l": first, "n": count, "t": text}):
+            self.reset("\n".join(self.lines))
+        return True
+
+    def clear(self, text=None):
+        # The buffer was saved, as text if given: nothing left to recover.
+        self.close_journal()
+        if self.unsaved:
+            for path in (snapshot_path(self.session_dir, self.generation),
+                         journal_path(self.session_dir, self.generation)):
+                if os.path.exists(path):
+                    os.remove(path)
+        self.lines = None if text is None else text.split("\n")
+        self.size = 0 if text is None else len(text)
+        self.unsaved = False
+        self.journal_size = 0
+
+    def discard(self):
+        self.close_journal()
+        self.lines = None
+        self.unsaved = False
+        discard_session(self.session_dir)
+
+
+class Autosaver:
+    # Writes checkpoints and saves on a background thread, in the order they
+    # were requested, so the UI thread only pays for reading the buffer, or
+    # just the lines edited since the last checkpoint. Save outcomes are
+    # collected by the UI thread with poll() as (path, error) pairs.
+    def __init__(self, recovery_dir=RECOVERY_DIR):
+        session_dir = os.path.join(recovery_dir, f"{os.getpid()}-{time.time_ns()}")
+        self.journal = SessionJournal(session_dir)
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        # True while the next checkpoint has to pass the whole buffer, i.e.
+        # the autosave thread does not hold the buffer of the last one (after
+        # opening a file, or a failed write).
+        self.needs_text = True
+        self.thread = threading.Thread(target=self.run, name="md2html-autosave", daemon=True)
+        self.thread.start()
+
+    def checkpoint(self, text, path=None):
+        self.needs_text = False
+        self.jobs.put(("checkpoint", path, text))
+
+    def checkpoint_lines(self, first, count, text, path=None):
+        # Lines [first, first + count) of the buffer as of the last
+        # checkpoint or save were replaced by text. Only while needs_text is
+        # False.
+        self.jobs.put(("lines", path, (first, count, text)))
+
+    def save(self, path, text):
+        self.needs_text = False
+        self.jobs.put(("save", path, text))
+
+    def mark_clean(self, path):
+        # The buffer matches path on disk, e.g. after opening it.
+        self.needs_text = True
+        self.jobs.put(("clean", path, None))
+
+    def discard(self):
+        self.jobs.put(("discard", None, None))
+
+    def close(self):
+        # Discards the session and ends the thread once queued work is done.
+        self.jobs.put(("close", None, None))
+
+    def flush(self):
+        self.jobs.join()
+
+    def poll(self):
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def run(self):
+        while True:
+            kind, path, text = self.jobs.get()
+            try:
+                if kind == "save":
+                    try:
+                        write_atomic(path, text)
+                    except Exception as e:
+                        self.results.put((path, e))
+                        # Keep the edits recoverable until a save succeeds.
+                        self.journal.append(text)
+                        continue
+                    self.journal.set_path(path)
+                    self.journal.clear(text)
+                    self.results.put((path, None))
+                elif kind == "checkpoint":
+                    self.journal.set_path(path)
+                    self.journal.append(text)
+                elif kind == "lines":
+                    self.journal.set_path(path)
+                    if not self.journal.replace_lines(*text):
+                        self.needs_text = True
+                elif kind == "clean":
+                    self.journal.set_path(path)
+                    self.journal.clear()
+                else:
+                    self.journal.discard()
+            except Exception:
+                # A failed checkpoint is retried in full by the next one.
+                self.journal.forget()
+                self.needs_text = True
+            finally:
+                self.jobs.task_done()
+            if kind == "close":
+                return
@@ -0,0 +1,1100 @@
+# Conversion core of CustomMD2HTML: Markdown conversion, style mapping,
+# config loading, render caching and batch builds. Nothing here imports a GUI
+# toolkit, so scripts and the "build" command can use it without a display.
+import re
+import html
+import json
+import os
+import sys
+import stat
+import time
+import bisect
+import hashlib
+import tempfile
+import threading
+import queue
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import markdown
+from markdown.extensions import Extension
+from markdown.extensions.attr_list import get_attrs_and_remainder
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+from markdown.postprocessors import Postprocessor
+from markdown.treeprocessors import Treeprocessor
+from markdown.util import BLOCK_LEVEL_ELEMENTS, HTML_PLACEHOLDER
+
+from md2html_trace import Tracer
+
+
+DEFAULT_CONFIG_FILE = "md_converter_config.json"
+
+DEFAULT_CONFIG = {
+    "style_mapping": {
+        "bold": "strong",
+        "italic": "em",
+        "code": "code",
+        "h1": "h1",
+        "h2": "h2",
+        "h3": "h3",
+        "h4": "h4",
+        "h5": "h5",
+        "h6": "h6",
+        "br": "br",
+        "p": "p",
+        "blockquote": "blockquote"
+    },
+    "font_family": "Segoe UI",
+    "font_size": 14,
+    "preview_debounce_ms": 150,
+    "autosave_delay_ms": 1000
+}
+
+
+def read_config(config_file, create_default=False):
+    # Missing config files fall back to the defaults; the editor also writes
+    # them out so there is a file to edit.
+    if not os.path.exists(config_file):
+        config = json.loads(json.dumps(DEFAULT_CONFIG))
+        if create_default:
+            with open(config_file, "w", encoding="utf-8") as f:
+                json.dump(config, f, indent=4)
+        return config
+    with open(config_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def replacement_mode(path):
+    # Permissions for a file about to replace path: those of the file it
+    # replaces, else the defaults for a new file (mkstemp files are private).
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def write_atomic(path, text):
+    # Readers never see a partly written file: write a temp file, then rename.
+    out_dir = os.path.dirname(os.path.abspath(path))
+    os.makedirs(out_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.chmod(tmp_path, replacement_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+# Element tag produced by python-markdown for each style mapping key.
+STYLE_MAPPING_ELEMENTS = {
+    "bold": "strong",
+    "italic": "em",
+    "code": "code",
+    "h1": "h1",
+    "h2": "h2",
+    "h3": "h3",
+    "h4": "h4",
+    "h5": "h5",
+    "h6": "h6",
+    "br": "br",
+    "p": "p",
+    "blockquote": "blockquote"
+}
+ELEMENT_STYLE_KEYS = {element_tag: key for key, element_tag in STYLE_MAPPING_ELEMENTS.items()}
+
+STASH_PLACEHOLDER_RE = re.compile(HTML_PLACEHOLDER % r"([0-9]+)")
+TAG_ATTRIBUTE_RE = re.compile(r"""([^\s=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"']+)))?""")
+TAG_NAME_RE = re.compile(r"[A-Za-z][A-Za-z0-9-]*")
+ATTRIBUTE_NAME_RE = re.compile(r"[^\s\"'<>/=]+")
+
+
+def changed_style_keys(old_mapping, new_mapping):
+    # Style keys whose tag differs between two mappings.
+    return {key for key, element_tag in STYLE_MAPPING_ELEMENTS.items()
+            if old_mapping.get(key, element_tag) != new_mapping.get(key, element_tag)}
+
+
+def parse_tag_spec(spec):
+    # Split a configured tag such as 'p class="x"' into its name and attributes.
+    # A trailing "/" ("br/", "br /") is dropped; raises ValueError for names
+    # that are not tag or attribute names.
+    spec = spec.strip()
+    if spec.endswith("/"):
+        spec = spec[:-1]
+    parts = spec.split(None, 1)
+    if not parts or not TAG_NAME_RE.fullmatch(parts[0]):
+        raise ValueError(f"{spec!r} is not a valid tag name")
+    attributes = []
+    if len(parts) > 1:
+        for match in TAG_ATTRIBUTE_RE.finditer(parts[1]):
+            name, double, single, bare = match.groups()
+            if not ATTRIBUTE_NAME_RE.fullmatch(name):
+                raise ValueError(f"{name!r} in {spec!r} is not a valid attribute name")
+            value = next((v for v in (double, single, bare) if v is not None), name)
+            attributes.append((name, value))
+    return parts[0], attributes
+
+
+def check_style_mapping(style_mapping):
+    # Raises ValueError naming the first key whose tag cannot be used. Empty
+    # values stand for the default tag.
+    for key, spec in style_mapping.items():
+        if not isinstance(spec, str):
+            raise ValueError(f"style_mapping[{key!r}] must be a string")
+        if spec.strip():
+            try:
+                parse_tag_spec(spec)
+            except ValueError as e:
+                raise ValueError(f"style_mapping[{key!r}]: {e}")
+
+
+class StyleMappingTreeprocessor(Treeprocessor):
+    # Renames elements and applies configured attributes on the tree, before
+    # it is serialized, so no string surgery on the HTML output is needed.
+    def __init__(self, md, style_mapping):
+        super().__init__(md)
+        self.set_style_mapping(style_mapping)
+        # Style keys whose elements occurred in the last document, so callers
+        # can tell which outputs a change of mapping affects.
+        self.used_keys = set()
+
+    def set_style_mapping(self, style_mapping):
+        self.targets = {}
+        for key, element_tag in STYLE_MAPPING_ELEMENTS.items():
+            spec = style_mapping.get(key, element_tag)
+            # Line breaks are written by LineBreakPostprocessor.
+            if key == "br" or not spec or not spec.strip():
+                continue
+            tag, attributes = parse_tag_spec(spec)
+            if tag != element_tag or attributes:
+                self.targets[element_tag] = (tag, attributes)
+
+    def run(self, root):
+        self.used_keys = set()
+        # Parent tags are taken before any element is renamed.
+        children = [(parent.tag, elem) for parent in root.iter() for elem in parent]
+        for parent_tag, elem in children:
+            key = ELEMENT_STYLE_KEYS.get(elem.tag)
+            if key is None or (elem.tag == "p" and self.wraps_block_html(elem)):
+                continue
+            # "code" maps inline code only; code blocks, indented or fenced,
+            # stay <pre><code>.
+            if elem.tag == "code" and parent_tag == "pre":
+                continue
+            self.used_keys.add(key)
+            target = self.targets.get(elem.tag)
+            if target is None:
+                continue
+            tag, attributes = target
+            elem.tag = tag
+            if attributes:
+                # Attributes already on the element (e.g. from attr_list) win,
+                # except classes, which are combined.
+                existing = dict(elem.attrib)
+                elem.attrib.clear()
+                elem.attrib.update(attributes)
+                if "class" in existing and "class" in elem.attrib:
+                    existing["class"] = f"{elem.attrib['class']} {existing['class']}"
+                elem.attrib.update(existing)
+
+    def wraps_block_html(self, elem):
+        # A paragraph holding only a stashed block of raw HTML (fenced code,
+        # HTML blocks) is unwrapped by the raw HTML postprocessor, which only
+        # recognises a bare <p>, so it must keep its name.
+        if len(elem) or not elem.text:
+            return False
+        match = STASH_PLACEHOLDER_RE.fullmatch(elem.text.strip())
+        if match is None:
+            return False
+        blocks = self.md.htmlStash.rawHtmlBlocks
+        index = int(match.group(1))
+        if index >= len(blocks):
+            return False
+        raw_html = self.md.postprocessors["raw_html"]
+        return raw_html.isblocklevel(raw_html.stash_to_string(blocks[index]))
+
+
+class LineBreakPostprocessor(Postprocessor):
+    # Writes line breaks as "<br>", or the tag configured for "br", as the
+    # string remapping did; other void elements keep the xhtml "<hr />" form.
+    # Runs before raw_html, so only breaks made from Markdown are replaced.
+    SERIALIZED = "<br />"
+
+    def __init__(self, md, style_mapping):
+        super().__init__(md)
+        self.set_style_mapping(style_mapping)
+
+    def set_style_mapping(self, style_mapping):
+        spec = style_mapping.get("br", "br")
+        if not spec or not spec.strip():
+            spec = "br"
+        tag, attributes = parse_tag_spec(spec)
+        self.replacement = "<" + tag + "".join(
+            f' {name}="{html.escape(value)}"' for name, value in attributes) + ">"
+
+    def run(self, text):
+        if self.replacement == self.SERIALIZED:
+            return text
+        return text.replace(self.SERIALIZED, self.replacement)
+
+
+class StyleMappingExtension(Extension):
+    def __init__(self, **kwargs):
+        self.config = {
+            "style_mapping": [{}, "Maps style keys (bold, h1, p, ...) to HTML tags."]
+        }
+        super().__init__(**kwargs)
+        self.processor = None
+        self.line_breaks = None
+
+    def extendMarkdown(self, md):
+        self.processor = StyleMappingTreeprocessor(md, self.getConfig("style_mapping"))
+        # After inline (20), attr_list (8) and abbr (7) have built the tree.
+        md.treeprocessors.register(self.processor, "style_mapping", 5)
+        self.line_breaks = LineBreakPostprocessor(md, self.getConfig("style_mapping"))
+        # Before raw_html (30) puts the document's own HTML back.
+        md.postprocessors.register(self.line_breaks, "style_mapping_br", 35)
+
+    def set_style_mapping(self, style_mapping):
+        self.setConfig("style_mapping", style_mapping)
+        if self.processor is not None:
+            self.processor.set_style_mapping(style_mapping)
+            self.line_breaks.set_style_mapping(style_mapping)
+
+
+class ReferenceTreeprocessor(Treeprocessor):
+    # Sets the link references of the document to a given set before inline
+    # patterns resolve links, so one block of a document can be rendered with
+    # the definitions of all the others.
+    def __init__(self, md):
+        super().__init__(md)
+        self.references = None
+
+    def run(self, root):
+        if self.references is not None:
+            self.md.references.update(self.references)
+
+
+class MarkdownConverter:
+    # One long-lived markdown.Markdown instance, reset between documents, so
+    # extensions are loaded once rather than on every conversion.
+    EXTENSIONS = ["extra", "nl2br"]
+    OUTPUT_FORMAT = "xhtml"
+
+    def __init__(self, style_mapping):
+        self.style_extension = StyleMappingExtension(style_mapping=dict(style_mapping))
+        self.md = markdown.Markdown(extensions=self.EXTENSIONS + [self.style_extension],
+                                    output_format=self.OUTPUT_FORMAT)
+        self.reference_processor = ReferenceTreeprocessor(self.md)
+        # After the block parser has collected the definitions, before inline (20).
+        self.md.treeprocessors.register(self.reference_processor, "references", 25)
+
+    def set_style_mapping(self, style_mapping):
+        self.style_extension.set_style_mapping(dict(style_mapping))
+
+    def convert(self, md_content, references=None):
+        # references ({id: (url, title)}) replace the document's own link
+        # definitions of the same ids.
+        md_content = md_content.replace("\t>", "    >")
+        self.reference_processor.references = references
+        return self.md.reset().convert(md_content)
+
+    def used_style_keys(self):
+        # Style mapping keys that applied to elements of the last document.
+        return self.style_extension.processor.used_keys
+
+    def defined_references(self):
+        # Link references defined by the last document.
+        return dict(self.md.references)
+
+
+# Constructs whose meaning spans the whole document (footnotes,
+# abbreviations, also when defined in a list item or blockquote) or that
+# python-markdown strips before parsing.
+GLOBAL_CONSTRUCT_RE = re.compile(r"\[\^|^(?:[ \t]*(?:[*+-][ \t]+|\d+\.[ \t]+|>[ \t]?))*[ \t]*\*\[|[\r\x02\x03]",
+                                 re.MULTILINE)
+# Link reference definitions also apply to the whole document; blocks that
+# may hold one are rendered first to collect them (see BlockRenderer).
+REFERENCE_RE = re.compile(r"\]:")
+# A chunk starting with a definition is removed by python-markdown, so the
+# chunks after it continue the block before it.
+REFERENCE_START_RE = re.compile(r" {0,3}\[[^\]\n]*\]:")
+# A chunk starting like this may continue the block before it (indented
+# continuation or code, lazily merged blockquotes and lists).
+CONTINUATION_RE = re.compile(r"[ \t]|[ ]{0,3}(?:>|[*+-][ \t]|\d+\.[ \t])")
+BLANK_LINES_RE = re.compile(r"\n\n+")
+LEADING_SPACES_RE = re.compile(r" +(?:\n|$)")
+# HTML the raw HTML parser may turn into a raw block: comments, declarations,
+# processing instructions and block-level tags at the start of a line. Tags
+# anywhere else (code spans, "a < b", inline HTML) are left as text.
+RAW_HTML_RE = re.compile(r"^ {0,3}<(?:[!?]|/?([A-Za-z][^`\t\n\r\f />\x00]*))", re.MULTILINE)
+# Elsewhere the parser passes markup through as text, unless it is unfinished:
+# it then leaves the rest of the document to its end-of-input handling, and
+# a comment runs on to the next "-->". Markup is only rendered per block when
+# it is complete on its line (or a tag name ends at a backtick, as in a code
+# span), and character references only when they end with ";".
+HTML_MARKUP_RE = re.compile(r"<[A-Za-z/!?]|&#")
+LOCAL_MARKUP_RE = re.compile(
+    r"""<(?:/?[A-Za-z][^`\t\n\r\f />\x00]*(?:[^<>"'`\n]|"[^"<>\n]*"|'[^'<>\n]*')*>"""
+    r"""|[A-Za-z][^`\t\n\r\f />\x00]*`|!--.*?-->|!(?!--)|\?)"""
+    r"""|&#(?:[0-9]+|[xX][0-9a-fA-F]+);""")
+# Markup in an attribute list stays in the attribute as a placeholder
+# numbered across the whole document.
+ATTR_LIST_MARKUP_RE = re.compile(r"\{[^}\n]*(?:<[A-Za-z/!?]|&[#A-Za-z])")
+# Definition list items join a preceding list even across a blank line.
+DEFINITION_RE = re.compile(r"^ {0,3}:[ \t]", re.MULTILINE)
+
+
+def find_fenced_spans(text):
+    # Character ranges of fenced code blocks, found the way python-markdown's
+    # fenced_code preprocessor finds them.
+    spans = []
+    index = 0
+    while True:
+        match = FencedBlockPreprocessor.FENCED_BLOCK_RE.search(text, index)
+        if match is None:
+            return spans
+        if match.group("attrs"):
+            remainder = get_attrs_and_remainder(match.group("attrs"))[1]
+            if remainder:
+                index = match.end("attrs")
+                continue
+        spans.append((match.start(), match.end()))
+        index = match.end()
+
+
+def normalize_markdown(md_content):
+    # The "\t>" fix-up of MarkdownConverter, then the same whitespace
+    # normalization python-markdown applies first. Normalizing twice changes
+    # nothing.
+    md_content = md_content.replace("\t>", "    >")
+    return re.sub(r"(?<=\n) +\n", "\n", md_content.expandtabs(4))
+
+
+def split_markdown_blocks(md_content):
+    # Splits a document into top-level blocks that render independently, such
+    # that joining the rendered blocks with newlines equals rendering the whole
+    # document. Returns a list of (first line, block text), or None when the
+    # document has to be rendered as a whole.
+    if GLOBAL_CONSTRUCT_RE.search(md_content.replace("\t>", "    >")):
+        return None
+    normalized = normalize_markdown(md_content)
+    if LEADING_SPACES_RE.match(normalized):
+        # A leading whitespace-only line is not blanked by python-markdown.
+        return None
+    fences = find_fenced_spans(normalized)
+    # python-markdown's raw HTML parser keeps state (and stale line offsets)
+    # across the whole document, so raw HTML blocks are only rendered in one
+    # piece.
+    fence_starts = [start for start, end in fences]
+
+    def in_fence(position):
+        fence = bisect.bisect_right(fence_starts, position) - 1
+        return fence >= 0 and position < fences[fence][1]
+
+    for match in RAW_HTML_RE.finditer(normalized):
+        tag = match.group(1)
+        if tag is not None and tag.lower() not in BLOCK_LEVEL_ELEMENTS:
+            continue
+        if not in_fence(match.start()):
+            return None
+    for match in ATTR_LIST_MARKUP_RE.finditer(normalized):
+        if not in_fence(match.start()):
+            return None
+    position = 0
+    while True:
+        match = HTML_MARKUP_RE.search(normalized, position)
+        if match is None:
+            break
+        local = LOCAL_MARKUP_RE.match(normalized, match.start())
+        if local is not None:
+            position = local.end()
+        elif in_fence(match.start()):
+            position = match.end()
+        else:
+            return None
+
+    # Chunks are separated by blank lines; fenced code is never cut.
+    chunks = []
+    chunk_start = 0
+    fence = 0
+    for match in BLANK_LINES_RE.finditer(normalized):
+        cut = match.start()
+        while fence < len(fences) and fences[fence][1] <= cut:
+            fence += 1
+        if fence < len(fences) and fences[fence][0] <= cut:
+            continue
+        if cut > chunk_start:
+            chunks.append((chunk_start, cut))
+        chunk_start = match.end()
+    chunk_end = len(normalized.rstrip("\n"))
+    if chunk_end > chunk_start:
+        chunks.append((chunk_start, chunk_end))
+
+    # Chunks that may belong to the block before them are merged into it.
+    definitions = [match.start() for match in DEFINITION_RE.finditer(normalized)]
+    definition = 0
+    blocks = []
+    line = 0
+    position = 0
+    for start, end in chunks:
+        line += normalized.count("\n", position, start)
+        position = start
+        while definition < len(definitions) and definitions[definition] < start:
+            definition += 1
+        has_definition = definition < len(definitions) and definitions[definition] < end
+        if blocks and has_definition:
+            # The term before a definition joins a definition list before it.
+            if len(blocks) > 1:
+                blocks[-2:] = [(blocks[-2][0], blocks[-1][1], blocks[-2][2])]
+            blocks[-1] = (blocks[-1][0], end, blocks[-1][2])
+        elif blocks and (CONTINUATION_RE.match(normalized, start) or REFERENCE_START_RE.match(normalized, start)):
+            blocks[-1] = (blocks[-1][0], end, blocks[-1][2])
+        else:
+            blocks.append((start, end, line))
+    return [(first_line, normalized[start:end]) for start, end, first_line in blocks]
+
+
+class BlockRenderer:
+    # Renders a document block by block, memoising the HTML of each block by
+    # its content. Between renders only the blocks around the lines that
+    # changed are split and converted again; the output is the same as a
+    # full render.
+    def __init__(self, converter):
+        self.converter = converter
+        self.reset()
+
+    def reset(self):
+        self.block_html = {}
+        self.block_references = {}
+        # The last document rendered, and the first line, text and HTML of
+        # each of its blocks; texts is None if it was rendered whole.
+        self.md_content = None
+        self.first_lines = []
+        self.texts = None
+        self.htmls = []
+        self.references = None
+        self.references_key = None
+        # Line of the first fence opener in it that no fence closes.
+        self.open_fence_line = None
+
+    def collect_references(self, blocks):
+        # Link definitions of the whole document, in the order python-markdown
+        # registers them (a later definition of an id wins). Only blocks that
+        # may hold one are rendered for this, and their definitions memoised.
+        references = {}
+        block_references = {}
+        for first, text in blocks:
+            if REFERENCE_RE.search(text) is None:
+                continue
+            found = block_references.get(text)
+            if found is None:
+                found = self.block_references.get(text)
+            if found is None:
+                self.converter.convert(text)
+                found = self.converter.defined_references()
+            block_references[text] = found
+            references.update(found)
+        self.block_references = block_references
+        return references
+
+    def block_key(self, text):
+        # Blocks that may use a reference are memoised per set of definitions.
+        return (text, self.references_key if self.references and "[" in text else None)
+
+    def update(self, md_content):
+        if self.texts is None or not self.update_changed(md_content):
+            self.update_all(md_content)
+        self.md_content = md_content
+
+    def update_all(self, md_content):
+        blocks = split_markdown_blocks(md_content)
+        if blocks is None:
+            self.reset()
+            self.first_lines = [0]
+            self.htmls = [self.converter.convert(md_content)]
+            return
+        self.references = self.collect_references(blocks) or None
+        self.references_key = tuple(sorted(self.references.items())) if self.references else None
+        htmls = []
+        block_html = {}
+        for first, text in blocks:
+            key = self.block_key(text)
+            html = block_html.get(key)
+            if html is None:
+                html = self.block_html.get(key)
+            if html is None:
+                html = self.converter.convert(text, self.references if key[1] else None)
+            block_html[key] = html
+            htmls.append(html)
+        # Only blocks of the current document are kept.
+        self.block_html = block_html
+        self.first_lines = [first for first, text in blocks]
+        self.texts = [text for first, text in blocks]
+        self.htmls = htmls
+        normalized = normalize_markdown(md_content)
+        open_fence = open_fence_start(normalized)
+        self.open_fence_line = None if open_fence is None else normalized.count("\n", 0, open_fence)
+
+    def update_changed(self, md_content):
+        # Splits again only the blocks from the one before the first changed
+        # line to the one after the last, which must be followed by an
+        # unchanged blank line, and keeps the others. The first block is
+        # split again with any change above it: it starts a block whatever
+        # it begins with, which may not hold once text comes before it.
+        # Returns False when that may not give the blocks of a full split: a
+        # fence opener no fence closes could now be closed in the changed
+        # part, and link reference definitions and definition lists reach
+        # into other blocks.
+        old = self.md_content
+        prefix = common_prefix_length(old, md_content)
+        if prefix == len(old) == len(md_content):
+            return True
+        suffix = common_suffix_length(old, md_content, min(len(old), len(md_content)) - prefix)
+        first = old.count("\n", 0, prefix)
+        old_end = old.count("\n", 0, len(old) - suffix) + 1
+        shift = md_content.count("\n", 0, len(md_content) - suffix) + 1 - old_end
+        lines = self.first_lines
+        start = max(bisect.bisect_right(lines, first) - 2, 0)
+        end = min(max(bisect.bisect_left(lines, old_end + 1), 1), len(lines))
+        if self.open_fence_line is not None and (end == len(lines) or self.open_fence_line < lines[end]):
+            return False
+        # The changed part runs from the start of block start, which comes
+        # before the first change (or from the top), to the start of block
+        # end in md_content.
+        base = lines[start] if start else 0
+        begin = old.rfind("\n", 0, prefix) + 1
+        for _ in range(first - base):
+            begin = old.rfind("\n", 0, begin - 1) + 1
+        if end == len(lines):
+            stop = len(md_content)
+        else:
+            stop = md_content.find("\n", len(md_content) - suffix) + 1
+            for _ in range(lines[end] - old_end):
+                stop = md_content.find("\n", stop) + 1
+        blocks = split_markdown_blocks(md_content[begin:stop])
+        if blocks is None:
+            return False
+        old_texts = self.texts[start:end]
+        for text in old_texts:
+            if REFERENCE_RE.search(text) or DEFINITION_RE.search(text):
+                return False
+        for first, text in blocks:
+            if REFERENCE_RE.search(text) or DEFINITION_RE.search(text):
+                return False
+            if FENCE_OPENER_RE.search(text) and open_fence_start(text) is not None:
+                return False
+        htmls = []
+        keys = set()
+        for first, text in blocks:
+            key = self.block_key(text)
+            html = self.block_html.get(key)
+            if html is None:
+                html = self.converter.convert(text, self.references if key[1] else None)
+                self.block_html[key] = html
+            keys.add(key)
+            htmls.append(html)
+        # The memo does not keep the blocks replaced, so it does not grow with
+        # every keystroke.
+        for text in old_texts:
+            key = self.block_key(text)
+            if key not in keys:
+                self.block_html.pop(key, None)
+        if shift:
+            lines[end:] = [line + shift for line in lines[end:]]
+            if self.open_fence_line is not None:
+                self.open_fence_line += shift
+        lines[start:end] = [base + first for first, text in blocks]
+        self.texts[start:end] = [text for first, text in blocks]
+        self.htmls[start:end] = htmls
+        return True
+
+    def render_blocks(self, md_content):
+        # Returns [(first line, html), ...] for the document's blocks.
+        self.update(md_content)
+        return list(zip(self.first_lines, self.htmls))
+
+    def render(self, md_content):
+        self.update(md_content)
+        return "\n".join(filter(None, self.htmls))
+
+
+STREAM_SEGMENT_SIZE = 1024 * 1024
+FENCE_OPENER_RE = re.compile(r"^(?:~{3,}|`{3,})", re.MULTILINE)
+
+
+def can_stream(src_path):
+    # Link references, footnotes and abbreviations apply to the whole
+    # document, and definitions can join any number of earlier blocks, so
+    # files using them are converted in one piece.
+    with open(src_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if GLOBAL_CONSTRUCT_RE.search(line) or REFERENCE_RE.search(line) or DEFINITION_RE.match(line):
+                return False
+    return True
+
+
+def open_fence_start(text):
+    # Position of the first fence opener in text that is not part of a
+    # complete fenced block, i.e. of a fence that text not read yet may still
+    # close. None when there is no such opener.
+    spans = find_fenced_spans(text)
+    span_starts = [start for start, end in spans]
+    for match in FENCE_OPENER_RE.finditer(text):
+        span = bisect.bisect_right(span_starts, match.start()) - 1
+        if span < 0 or match.start() >= spans[span][1]:
+            return match.start()
+    return None
+
+
+def stream_convert(src_path, out, converter, segment_size=STREAM_SEGMENT_SIZE):
+    # Writes the HTML of the Markdown file src_path to the text file out,
+    # holding about segment_size characters of Markdown at a time. Segments
+    # are cut between independent blocks (see split_markdown_blocks); the
+    # last block of a segment is carried into the next one, since blocks only
+    # ever merge into the block before them. The output equals converting the
+    # whole file. Returns the number of characters read.
+    if can_stream(src_path):
+        pending = []
+        pending_size = 0
+        next_check = segment_size
+        nchars = 0
+        wrote = False
+        with open(src_path, "r", encoding="utf-8") as f:
+            for line in f:
+                pending.append(line)
+                pending_size += len(line)
+                nchars += len(line)
+                if pending_size < next_check:
+                    continue
+                normalized = normalize_markdown("".join(pending))
+                # Blocks from an open fence on may still change, so only the
+                # text before it is cut.
+                open_fence = open_fence_start(normalized)
+                head = normalized if open_fence is None else normalized[:open_fence]
+                blocks = split_markdown_blocks(head)
+                if blocks is None:
+                    break
+                if len(blocks) < 2:
+                    # Nothing can be cut yet; look again once the buffer doubled.
+                    pending = [normalized]
+                    next_check = 2 * pending_size
+                    continue
+                for first, text in blocks[:-1]:
+                    html = converter.convert(text)
+                    if html:
+                        out.write("\n" + html if wrote else html)
+                        wrote = True
+                carry = normalized[head.rindex(blocks[-1][1]):]
+                pending = [carry]
+                pending_size = len(carry)
+                next_check = pending_size + segment_size
+            else:
+                text = "".join(pending)
+                if not wrote or split_markdown_blocks(text) is not None:
+                    html = converter.convert(text)
+                    if html:
+                        out.write("\n" + html if wrote else html)
+                    return nchars
+    # The document has to be rendered as a whole (e.g. it contains raw HTML).
+    out.seek(0)
+    out.truncate()
+    with open(src_path, "r", encoding="utf-8") as f:
+        md_content = f.read()
+    out.write(converter.convert(md_content))
+    return len(md_content)
+
+
+def convert_file(src_path, out_path, converter, segment_size=STREAM_SEGMENT_SIZE):
+    # Streams the HTML of src_path into out_path, which is replaced atomically.
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as out:
+            nchars = stream_convert(src_path, out, converter, segment_size)
+        os.chmod(tmp_path, replacement_mode(out_path))
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return nchars
+
+
+DEFAULT_CACHE_DIR = ".md2html_cache"
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+
+class RenderCache:
+    # Content-addressed on-disk cache of rendered HTML. Entries are keyed by a
+    # hash of the Markdown source, the normalized style mapping, the extension
+    # list and the markdown version, and evicted least-recently-used first
+    # (file mtimes record use, so the order survives restarts).
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Bytes written by put(), for callers that trim on their own.
+        self.written = 0
+        # key -> size, least recently used first; loaded on first eviction.
+        self.entries = None
+        self.total_bytes = 0
+
+    def key(self, md_content, style_mapping):
+        # Specs are compared as parsed, so spacing between attributes does
+        # not matter but spacing inside attribute values does.
+        normalized = {}
+        for key, element_tag in STYLE_MAPPING_ELEMENTS.items():
+            spec = style_mapping.get(key) or ""
+            normalized[key] = parse_tag_spec(spec) if spec.strip() else (element_tag, [])
+        digest = hashlib.sha256()
+        digest.update(md_content.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(json.dumps(normalized, sort_keys=True).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(json.dumps(MarkdownConverter.EXTENSIONS + [MarkdownConverter.OUTPUT_FORMAT]).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(markdown.__version__.encode("utf-8"))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".html")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                html = f.read()
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.entries is not None and key in self.entries:
+            self.entries.move_to_end(key)
+        return html
+
+    def put(self, key, html, evict=True):
+        # Writers in a process pool pass evict=False and leave trimming to
+        # the parent, which sees the whole cache.
+        path = self.path(key)
+        data = html.encode("utf-8")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                # Typically a full disk, which the temp file must not fill
+                # further.
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            return
+        self.written += len(data)
+        if evict:
+            if self.entries is None:
+                self.load_index()
+            else:
+                self.total_bytes += len(data) - self.entries.pop(key, 0)
+                self.entries[key] = len(data)
+            self.evict()
+
+    def load_index(self):
+        found = []
+        try:
+            with os.scandir(self.cache_dir) as shards:
+                for shard in shards:
+                    if not shard.is_dir():
+                        continue
+                    with os.scandir(shard.path) as files:
+                        for entry in files:
+                            if entry.name.endswith(".html"):
+                                st = entry.stat()
+                                found.append((st.st_mtime_ns, entry.name[:-5], st.st_size))
+        except OSError:
+            pass
+        found.sort()
+        self.entries = OrderedDict((key, size) for _, key, size in found)
+        self.total_bytes = sum(self.entries.values())
+
+    def evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def trim(self):
+        # Re-scan the cache directory and evict down to the size cap.
+        self.load_index()
+        self.evict()
+
+    def trim_in_background(self):
+        # trim() on a thread, with a cache object of its own, for callers that
+        # must not wait for the directory scan.
+        cache = RenderCache(self.cache_dir, self.max_bytes)
+        thread = threading.Thread(target=cache.trim, name="md2html-cache-trim", daemon=True)
+        thread.start()
+        return thread
+
+
+class RenderWorker:
+    # Converts Markdown on a background thread, block by block so unchanged
+    # blocks are not converted again. Requests are coalesced: only the latest
+    # submitted revision is rendered, older pending ones are dropped. Results
+    # are collected by the UI thread with poll(), as (revision, html, preview
+    # blocks, error), the HTML already cut up by split_html_blocks; those
+    # submitted with store=True are also written to cache.
+    def __init__(self, style_mapping, tracer=None, cache=None):
+        self.tracer = tracer or Tracer()
+        self.cache = cache
+        self.converter = MarkdownConverter(style_mapping)
+        self.renderer = BlockRenderer(self.converter)
+        self.style_mapping = dict(style_mapping)
+        self.condition = threading.Condition()
+        self.pending = None
+        self.busy = False
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="md2html-render", daemon=True)
+        self.thread.start()
+
+    def submit(self, revision, md_content, style_mapping, store=False):
+        with self.condition:
+            self.pending = (revision, md_content, dict(style_mapping), store)
+            self.condition.notify()
+
+    def is_idle(self):
+        with self.condition:
+            return self.pending is None and not self.busy and self.results.empty()
+
+    def poll(self):
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                revision, md_content, style_mapping, store = self.pending
+                self.pending = None
+                self.busy = True
+            try:
+                if style_mapping != self.style_mapping:
+                    self.converter.set_style_mapping(style_mapping)
+                    self.renderer.reset()
+                    self.style_mapping = style_mapping
+                with self.tracer.stage("render (worker)", len(md_content)) as stage:
+                    html_content = self.renderer.render(md_content)
+                    stage.set_output(len(html_content))
+                with self.tracer.stage("split (worker)", len(html_content)):
+                    blocks = split_html_blocks(html_content)
+                if store and self.cache is not None:
+                    self.cache.put(self.cache.key(md_content, style_mapping), html_content, evict=False)
+                result = (revision, html_content, blocks, None)
+            except Exception as e:
+                result = (revision, None, None, e)
+            with self.condition:
+                self.results.put(result)
+                self.busy = False
+
+
+PREFIX_STEP = 64 * 1024
+
+
+def common_prefix_length(old, new):
+    # Compares slices of PREFIX_STEP characters up to the first that differs,
+    # then binary searches on slice equality in it, so comparisons run at C
+    # speed and copy little more than the common prefix.
+    low, high = 0, min(len(old), len(new))
+    while low + PREFIX_STEP <= high and old[low:low + PREFIX_STEP] == new[low:low + PREFIX_STEP]:
+        low += PREFIX_STEP
+    known, high = low, min(high, low + PREFIX_STEP)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[known:middle] == new[known:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix_length(old, new, limit):
+    old_end, new_end = len(old), len(new)
+    low, high = 0, limit
+    while low + PREFIX_STEP <= high and \
+            old[old_end - low - PREFIX_STEP:old_end - low] == new[new_end - low - PREFIX_STEP:new_end - low]:
+        low += PREFIX_STEP
+    known, high = low, min(high, low + PREFIX_STEP)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[old_end - middle:old_end - known] == new[new_end - middle:new_end - known]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def changed_line_range(old, new):
+    # Lines [start, old_end) of old are replaced by lines [start, new_end) of
+    # new; all other lines are the same in both.
+    prefix = common_prefix_length(old, new)
+    suffix = common_suffix_length(old, new, min(len(old), len(new)) - prefix)
+    start = old.count("\n", 0, prefix)
+    old_end = old.count("\n", 0, len(old) - suffix) + 1
+    new_end = new.count("\n", 0, len(new) - suffix) + 1
+    return start, old_end, new_end
+
+
+HTML_TOKEN_RE = re.compile(r"<!--.*?-->|<(/?)([A-Za-z][A-Za-z0-9-]*)[^>]*?(/?)>|\n", re.DOTALL)
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+                 "param", "source", "track", "wbr"}
+
+
+def split_html_blocks(html, target_size=4096):
+    # Cuts serialized HTML into pieces of at least target_size characters at
+    # newlines between top-level elements, so each piece renders on its own.
+    blocks = []
+    depth = 0
+    start = 0
+    for match in HTML_TOKEN_RE.finditer(html):
+        if match.group(2):
+            if match.group(1):
+                depth = max(depth - 1, 0)
+            elif not match.group(3) and match.group(2).lower() not in VOID_ELEMENTS:
+                depth += 1
+        elif depth == 0 and match.group() == "\n" and match.start() - start >= target_size:
+            blocks.append(html[start:match.start()])
+            start = match.end()
+    if start < len(html) or not blocks:
+        blocks.append(html[start:])
+    return blocks
+
+# Headless batch conversion ("build"). Each worker process keeps its own
+# long-lived converter, created once by the pool initializer.
+build_converter = None
+build_style_mapping = None
+build_cache = None
+
+
+def init_build_worker(style_mapping, cache_dir=None, cache_size=DEFAULT_CACHE_SIZE):
+    global build_converter, build_style_mapping, build_cache
+    build_converter = MarkdownConverter(style_mapping)
+    build_style_mapping = style_mapping
+    build_cache = RenderCache(cache_dir, cache_size) if cache_dir else None
+
+
+def build_file(job):
+    src_path, out_path = job
+    cache_hit = False
+    try:
+        with open(src_path, "r", encoding="utf-8") as f:
+            md_content = f.read()
+        html_content = None
+        if build_cache is not None:
+            cache_key = build_cache.key(md_content, build_style_mapping)
+            html_content = build_cache.get(cache_key)
+            cache_hit = html_content is not None
+        if html_content is None:
+            html_content = build_converter.convert(md_content)
+            if build_cache is not None:
+                build_cache.put(cache_key, html_content, evict=False)
+        out_dir = os.path.dirname(out_path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(html_content)
+    except Exception as e:
+        return src_path, 0, cache_hit, f"{type(e).__name__}: {e}"
+    return src_path, len(md_content.encode("utf-8")), cache_hit, None
+
+
+def find_markdown_files(src_dir):
+    for dirpath, dirnames, filenames in os.walk(src_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(".md"):
+                yield os.path.join(dirpath, filename)
+
+
+def build_jobs(src_dir, out_dir):
+    jobs = []
+    for src_path in find_markdown_files(src_dir):
+        rel_path = os.path.relpath(src_path, src_dir)
+        out_path = os.path.join(out_dir, os.path.splitext(rel_path)[0] + ".html")
+        jobs.append((src_path, out_path))
+    return jobs
+
+
+def build_site(src_dir, out_dir, style_mapping, workers=None, cache_dir=None,
+               cache_size=DEFAULT_CACHE_SIZE):
+    # Converts every .md file under src_dir into a mirrored tree under out_dir.
+    # Returns (files converted, bytes read, cache hits, [(src_path, error), ...]).
+    jobs = build_jobs(src_dir, out_dir)
+    converted = 0
+    total_bytes = 0
+    cache_hits = 0
+    failures = []
+    workers = workers or os.cpu_count() or 1
+    initargs = (style_mapping, cache_dir, cache_size)
+    if workers == 1 or len(jobs) < 2:
+        init_build_worker(*initargs)
+        results = map(build_file, jobs)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_build_worker,
+                                       initargs=initargs)
+        chunksize = max(1, len(jobs) // (workers * 8))
+        results = executor.map(build_file, jobs, chunksize=chunksize)
+    try:
+        for src_path, nbytes, cache_hit, error in results:
+            cache_hits += cache_hit
+            if error is None:
+                converted += 1
+                total_bytes += nbytes
+            else:
+                failures.append((src_path, error))
+                print(f"FAILED {src_path}: {error}", file=sys.stderr)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if cache_dir:
+        RenderCache(cache_dir, cache_size).trim()
+    return converted, total_bytes, cache_hits, failures
+
+
+def run_build(args):
+    if not os.path.isdir(args.src):
+        print(f"Source directory not found: {args.src}", file=sys.stderr)
+        return 2
+    try:
+        config = read_config(args.config)
+        style_mapping = config.get("style_mapping", DEFAULT_CONFIG["style_mapping"])
+        check_style_mapping(style_mapping)
+    except (OSError, ValueError) as e:
+        print(f"Error reading config file {args.config}: {e}", file=sys.stderr)
+        return 2
+    cache_dir = None if args.no_cache else args.cache_dir
+    start = time.perf_counter()
+    converted, total_bytes, cache_hits, failures = build_site(
+        args.src, args.out, style_mapping, args.jobs, cache_dir, args.cache_size * 1024 * 1024)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"Converted {converted} file(s), {len(failures)} failed, in {elapsed:.2f}s "
+          f"({converted / elapsed:.1f} files/s, {total_bytes / elapsed / 1e6:.2f} MB/s)")
+    if cache_dir:
+        attempted = converted + len(failures)
+        print(f"Render cache: {cache_hits} hit(s), {attempted - cache_hits} miss(es)")
+    return 1 if failures else 0
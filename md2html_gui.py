@@ -0,0 +1,1217 @@
+# Editor window of CustomMD2HTML. Imported only when the GUI is launched;
+# the conversion itself lives in md2html_core.
+import json
+import os
+import time
+import tkinter as tk
+from tkinter import filedialog, messagebox
+import tkinter.font as tkfont
+
+# Use ttkbootstrap for a modern UI.
+import ttkbootstrap as ttk
+from ttkbootstrap.constants import *
+
+from md2html_core import (DEFAULT_CONFIG, MarkdownConverter, RenderCache, RenderWorker,
+                          changed_line_range, check_style_mapping, convert_file, read_config,
+                          split_html_blocks)
+from md2html_autosave import Autosaver, discard_session, find_sessions, replay
+from md2html_highlight import TAGS, IncrementalHighlighter
+from md2html_trace import Tracer
+
+# Characters inserted into the editor per event-loop step when opening a file.
+LOAD_CHUNK_SIZE = 256 * 1024
+# Cached renders of open documents are dropped, least recently viewed tab
+# first, once together they exceed this many characters of HTML.
+PREVIEW_CACHE_CHARS = 64 * 1024 * 1024
+# The render cache is trimmed after the first write and then after every
+# this many bytes written to it.
+CACHE_TRIM_BYTES = 16 * 1024 * 1024
+
+
+class VirtualHTMLPreview(ttk.Frame):
+    # Rendered preview that only lays out the part of the document near the
+    # viewport. Large HTML is cut into blocks and a window of blocks around the
+    # visible position is rendered into one HTMLLabel; the window moves as the
+    # user scrolls. The scrollbar shows the position in the whole document.
+    WINDOW_BLOCKS = 16
+    VIRTUAL_THRESHOLD = 64 * 1024
+    
+    def __init__(self, master, background=None, font=None):
+        # tkhtmlview (and the requests stack it pulls in) loads with the
+        # first rendered preview rather than at startup.
+        from tkhtmlview import HTMLLabel
+        
+        super().__init__(master)
+        self.html = ""
+        self.blocks = [""]
+        self.start = 0
+        self.end = 1
+        self.recenter_after_id = None
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.label = HTMLLabel(self, html="", background=background, font=font)
+        self.label.pack(side="left", expand=True, fill="both")
+        # The label's own scrollbar only covers the window; use ours instead.
+        self.label.vbar.pack_forget()
+        self.label.configure(yscrollcommand=self.on_label_scroll)
+    
+    def set_html(self, html, blocks=None):
+        # blocks, if given, is split_html_blocks(html), worked out off the UI
+        # thread.
+        position = self.position()
+        self.html = html
+        if len(html) > self.VIRTUAL_THRESHOLD:
+            self.blocks = split_html_blocks(html) if blocks is None else blocks
+        else:
+            self.blocks = [html]
+        self.start = self.end = 0
+        self.moveto(position)
+    
+    def position(self):
+        first = self.label.yview()[0]
+        return (self.start + first * (self.end - self.start)) / len(self.blocks)
+    
+    def moveto(self, fraction):
+        # Show the window of blocks around fraction and scroll to it.
+        total = len(self.blocks)
+        target = min(max(fraction, 0.0), 1.0) * total
+        start = min(max(int(target) - self.WINDOW_BLOCKS // 2, 0), max(total - self.WINDOW_BLOCKS, 0))
+        end = min(total, start + self.WINDOW_BLOCKS)
+        if (start, end) != (self.start, self.end):
+            self.start, self.end = start, end
+            self.label.set_html("\n".join(self.blocks[start:end]))
+        self.label.yview_moveto((target - start) / (end - start))
+    
+    def show_fraction(self, fraction):
+        # Bring a position into view unless it is already visible.
+        first, last = self.scrollbar.get()
+        if not first <= fraction <= last:
+            self.moveto(fraction - (last - first) / 2)
+    
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.moveto(float(amount))
+        else:
+            self.label.yview_scroll(int(amount), unit)
+    
+    def on_label_scroll(self, first, last):
+        first, last = float(first), float(last)
+        total = len(self.blocks)
+        span = self.end - self.start
+        self.scrollbar.set((self.start + first * span) / total, (self.start + last * span) / total)
+        # Near either edge of the window, move the window after this event.
+        near_end = last > 0.95 and self.end < total
+        near_start = first < 0.05 and self.start > 0
+        if (near_end or near_start) and self.recenter_after_id is None:
+            self.recenter_after_id = self.after_idle(self.recenter)
+    
+    def recenter(self):
+        self.recenter_after_id = None
+        self.moveto(self.position())
+
+
+class MarkdownHighlighter:
+    # Markdown syntax highlighting of a Text widget. The widget command is
+    # replaced by a Tcl proc that hands edits (insert, delete, replace) to
+    # Python and passes everything else straight through, so reads of the
+    # buffer pay nothing. The edited lines, and whatever they change on
+    # screen, are re-tagged right away; the rest is done in short slices
+    # while the event loop is idle. Undo and redo replay their edits through
+    # the widget command as well. on_lines_replaced(first, old count, new
+    # count), if given, is told about every edit.
+    IDLE_SLICE = 0.01
+    
+    def __init__(self, text, base_font, on_lines_replaced=None):
+        self.text = text
+        self.on_lines_replaced = on_lines_replaced
+        self.tk = text.tk
+        self.widget = str(text)
+        self.orig = self.widget + "_orig"
+        self.callback = self.widget + "_edit"
+        self.engine = IncrementalHighlighter(self.get_lines, self.apply)
+        self.idle_id = None
+        self.fonts = {}
+        self.update_fonts(base_font)
+        text.tag_configure("md_heading", font=self.fonts["md_heading"], foreground="#1f4e79")
+        text.tag_configure("md_quote", foreground="#6a737d")
+        text.tag_configure("md_link", foreground="#0b61a4", underline=True)
+        text.tag_configure("md_bold", font=self.fonts["md_bold"])
+        text.tag_configure("md_italic", font=self.fonts["md_italic"])
+        text.tag_configure("md_code", font=self.fonts["md_code"], background="#f3f3f3")
+        text.tag_configure("md_fence", font=self.fonts["md_code"], background="#f3f3f3", foreground="#6a737d")
+        # Later tags take priority; the selection stays on top.
+        text.tag_raise("sel")
+        self.tk.call("rename", self.widget, self.orig)
+        self.tk.createcommand(self.callback, self.on_edit)
+        self.tk.call("proc", self.widget, "operation args", f"""
+            switch -- $operation {{
+                insert - delete - replace {{ tailcall {self.callback} $operation {{*}}$args }}
+                default {{ tailcall {self.orig} $operation {{*}}$args }}
+            }}""")
+        self.engine.reset(self.line_count())
+    
+    def update_fonts(self, base_font):
+        # The tag fonts follow the family and size of the editor font.
+        family = base_font.actual("family")
+        size = base_font.actual("size")
+        specs = {
+            "md_heading": {"family": family, "size": size, "weight": "bold"},
+            "md_bold": {"family": family, "size": size, "weight": "bold"},
+            "md_italic": {"family": family, "size": size, "slant": "italic"},
+            "md_code": {"family": tkfont.nametofont("TkFixedFont").actual("family"), "size": size},
+        }
+        for name, spec in specs.items():
+            if name in self.fonts:
+                self.fonts[name].config(**spec)
+            else:
+                self.fonts[name] = tkfont.Font(**spec)
+    
+    def close(self):
+        # Restores the widget command; call before destroying the widget.
+        if self.idle_id is not None:
+            self.text.after_cancel(self.idle_id)
+            self.idle_id = None
+        self.tk.call("rename", self.widget, "")
+        self.tk.call("rename", self.orig, self.widget)
+        self.tk.deletecommand(self.callback)
+    
+    def line_of(self, index):
+        return int(str(self.tk.call(self.orig, "index", index)).split(".")[0])
+    
+    def line_count(self):
+        return self.line_of("end-1c")
+    
+    def on_edit(self, operation, *args):
+        # Lines touched by the edit, found before it moves them.
+        if operation == "insert":
+            indexes = args[:1]
+        elif operation == "delete":
+            # A lone index deletes one character, which may join two lines.
+            indexes = args + (args[-1] + "+1c",) if len(args) % 2 else args
+        else:
+            indexes = args[:2]
+        before = self.line_count()
+        lines = [min(self.line_of(index), before) for index in indexes]
+        result = self.tk.call((self.orig, operation) + args)
+        first, last = min(lines) - 1, max(lines)
+        new_count = last - first + self.line_count() - before
+        self.engine.lines_replaced(first, last - first, new_count)
+        if self.on_lines_replaced is not None:
+            self.on_lines_replaced(first, last - first, new_count)
+        # What is on screen is tagged before it is drawn, from the edit on;
+        # pending work above it is left to idle time. An edit above the
+        # view tags no more than a screenful.
+        top = self.line_of("@0,0")
+        bottom = self.line_of(f"@0,{self.text.winfo_height()}")
+        self.engine.run_edit(first, min(bottom, first + bottom - top + 1))
+        if self.engine.has_work() and self.idle_id is None:
+            self.idle_id = self.text.after_idle(self.run_idle)
+        return result
+    
+    def run_idle(self):
+        self.idle_id = None
+        self.engine.run(deadline=time.perf_counter() + self.IDLE_SLICE)
+        if self.engine.has_work():
+            self.idle_id = self.text.after_idle(self.run_idle)
+    
+    def get_lines(self, first, last):
+        return str(self.tk.call(self.orig, "get", f"{first + 1}.0", f"{last}.end")).split("\n")
+    
+    def apply(self, first, last, spans):
+        start, end = f"{first + 1}.0", f"{last + 1}.0"
+        for tag in TAGS:
+            self.tk.call(self.orig, "tag", "remove", tag, start, end)
+        for tag, ranges in spans.items():
+            indexes = []
+            for line, span_start, span_end in ranges:
+                indexes.append(f"{line + 1}.{span_start}")
+                indexes.append(f"{line + 2}.0" if span_end is None else f"{line + 1}.{span_end}")
+            self.tk.call(self.orig, "tag", "add", tag, *indexes)
+
+
+class Document:
+    # One open Markdown document: the buffer of its editor tab, the file it
+    # belongs to and its last render. The widgets are built by
+    # CustomMD2HTML.create_document_tab.
+    def __init__(self):
+        # File the buffer was loaded from or saved to.
+        self.filepath = None
+        self.name = "Untitled"
+        # True once the buffer differs from the file it was loaded from.
+        self.source_modified = False
+        # Counts changes to the buffer, so a save that completes after
+        # further typing leaves the buffer marked modified, and a render can
+        # tell whether it is current.
+        self.edit_revision = 0
+        self.saves_in_flight = []
+        # Checkpoints of the buffer and Markdown saves are written on a
+        # background thread.
+        self.autosaver = Autosaver()
+        self.autosave_after_id = None
+        # Lines edited since the last checkpoint or save, as (first, old end,
+        # new end): lines [first, old end) of the buffer the autosaver holds
+        # are now lines [first, new end). None if none were edited.
+        self.changed_lines = None
+        # File being loaded into the editor, a chunk per event-loop step.
+        self.load_file = None
+        self.load_path = None
+        self.loaded_chars = 0
+        # Last rendered HTML and the (edit_revision, mapping_version) it was
+        # rendered from; both None once the render is evicted.
+        self.html = None
+        self.rendered = None
+        # HTML currently shown by each preview widget, for partial updates.
+        self.html_text_content = None
+        self.html_view_content = None
+        # Rendered preview position, kept while the preview is evicted.
+        self.view_position = None
+        # A render is due although none is cached (e.g. the file finished
+        # loading while another tab was selected).
+        self.render_wanted = False
+        # The cached render was dropped to save memory; the tab is rendered
+        # again when it is next selected.
+        self.evicted = False
+        # Tick of the last time the tab was selected, for eviction.
+        self.last_viewed = 0
+    
+    def lines_replaced(self, first, old_count, new_count):
+        # Called by the highlighter for every edit of the buffer.
+        if self.changed_lines is None:
+            self.changed_lines = (first, first + old_count, first + new_count)
+            return
+        changed_first, old_end, new_end = self.changed_lines
+        last = max(new_end, first + old_count)
+        self.changed_lines = (min(changed_first, first), old_end + last - new_end, last + new_count - old_count)
+
+
+class CustomMD2HTML:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("CustomMD2HTML")
+        self.root.geometry("900x800")
+    
+        # Configuration file path.
+        self.config_file = "md_converter_config.json"
+    
+        # Default style mappings. Note new keys: "p" and "blockquote".
+        self.style_mapping = {
+            "bold": "strong",
+            "italic": "em",
+            "code": "code",
+            "h1": "h1",
+            "h2": "h2",
+            "h3": "h3",
+            "h4": "h4",
+            "h5": "h5",
+            "h6": "h6",
+            "br": "br",
+            "p": "p",
+            "blockquote": "blockquote"
+        }
+        # Bumped whenever the style mapping may have changed, which makes
+        # every cached render out of date.
+        self.mapping_version = 0
+        # Long-lived Markdown converter, built on the first conversion and
+        # dropped when the style mapping changes.
+        self.converter = None
+        # Rendered HTML shared with the "build" command. Trimming scans the
+        # whole cache directory, so it runs on a background thread.
+        self.render_cache = RenderCache()
+        self.cache_trim_thread = None
+        self.cache_trim_at = 0
+        # Renders run off the UI thread. Each render request for the selected
+        # document gets a revision; results for anything but the latest one
+        # are dropped. Documents in other tabs are re-rendered, one at a
+        # time, while the worker has nothing else to do.
+        self.render_worker = None
+        self.render_revision = 0
+        self.render_source = None
+        self.preview_debounce_ms = DEFAULT_CONFIG["preview_debounce_ms"]
+        self.debounce_after_id = None
+        self.poll_after_id = None
+        self.prerender_after_id = None
+        self.autosave_delay_ms = DEFAULT_CONFIG["autosave_delay_ms"]
+        self.save_poll_after_id = None
+        # Open documents in tab order, and the one in the selected tab (the
+        # last selected one while the Settings tab is shown).
+        self.documents = []
+        self.doc = None
+        self.view_ticks = 0
+        # Fixed font settings.
+        self.font_family = "Segoe UI"
+        self.font_size = 14
+        self.text_font = tkfont.Font(family=self.font_family, size=self.font_size)
+    
+        # Control variables.
+        self.live_preview = tk.BooleanVar(value=False)
+        self.render_preview = tk.BooleanVar(value=True)
+        # Per-stage render timings; off unless enabled from an editor tab.
+        self.tracer = Tracer()
+        self.trace_enabled = tk.BooleanVar(value=False)
+    
+        # Load configuration.
+        self.load_config()
+    
+        # Create Notebook: a tab per open document, then Settings.
+        self.notebook = ttk.Notebook(self.root)
+        self.notebook.pack(expand=True, fill="both", padx=10, pady=10)
+    
+        self.create_settings_tab()
+        self.new_document()
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+    
+        # Global key bindings for Markdown file operations.
+        self.root.bind("<Control-s>", self.save_markdown)
+        self.root.bind("<Control-o>", self.open_markdown)
+        self.root.bind("<Control-n>", self.new_document)
+        self.root.bind("<Control-w>", self.close_document)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after_idle(self.recover_sessions)
+    
+    def create_document_tab(self, doc):
+        # Create the editor tab of a document, in front of the Settings tab.
+        doc.frame = ttk.Frame(self.notebook)
+        self.notebook.insert(self.settings_frame, doc.frame, text=doc.name)
+    
+        # Status bar with rolling p50/p95 stage timings while tracing.
+        doc.trace_status = ttk.Label(doc.frame, text="", anchor="w")
+        doc.trace_status.pack(side="bottom", fill="x", padx=10)
+    
+        # Vertical PanedWindow: top = Markdown editor, bottom = preview area.
+        doc.main_paned = ttk.PanedWindow(doc.frame, orient="vertical")
+        doc.main_paned.pack(expand=True, fill="both", padx=10, pady=10)
+    
+        # Top pane: Markdown editor area.
+        doc.editor_area_frame = ttk.Frame(doc.main_paned)
+        doc.main_paned.add(doc.editor_area_frame, weight=3)
+    
+        # Label shows the document name.
+        doc.md_label = ttk.Label(doc.editor_area_frame, text=doc.name)
+        doc.md_label.pack(anchor="w", pady=(5, 0))
+    
+        doc.md_text = tk.Text(doc.editor_area_frame, wrap="word", undo=True,
+                               font=self.text_font, relief="flat", borderwidth=0, background="white")
+        doc.md_text.bind("<Control-z>", self.undo_action)
+        doc.md_text.bind("<Control-Z>", self.undo_action)
+        doc.md_text.bind("<Control-Shift-z>", self.redo_action)
+        doc.md_text.bind("<Control-Shift-Z>", self.redo_action)
+        doc.md_text.pack(expand=True, fill="both", pady=10)
+        doc.highlighter = MarkdownHighlighter(doc.md_text, self.text_font, doc.lines_replaced)
+    
+        # Bottom pane: Contains controls and preview area.
+        doc.preview_area_frame = ttk.Frame(doc.main_paned)
+        doc.main_paned.add(doc.preview_area_frame, weight=2)
+    
+        # Controls frame.
+        doc.controls_frame = ttk.Frame(doc.preview_area_frame)
+        doc.controls_frame.pack(fill="x", pady=5)
+    
+        doc.convert_button = ttk.Button(doc.controls_frame, text="Convert to HTML",
+                                        command=self.convert_to_html, bootstyle=PRIMARY)
+        doc.convert_button.pack(side="left", padx=5)
+    
+        doc.save_html_button = ttk.Button(doc.controls_frame, text="Save HTML",
+                                          command=self.save_html, bootstyle=SUCCESS)
+        doc.save_html_button.pack(side="left", padx=5)
+    
+        # Shown while a file is being loaded.
+        doc.load_progress = ttk.Progressbar(doc.controls_frame, mode="determinate", length=150)
+    
+        doc.live_preview_checkbox = ttk.Checkbutton(doc.controls_frame, text="Live HTML Preview",
+                                                      variable=self.live_preview, command=self.toggle_live_preview)
+        doc.live_preview_checkbox.pack(side="left", padx=5)
+    
+        doc.render_preview_checkbox = ttk.Checkbutton(doc.controls_frame, text="Rendered Preview",
+                                                        variable=self.render_preview, command=self.convert_to_html)
+        doc.render_preview_checkbox.pack(side="left", padx=5)
+    
+        doc.trace_checkbox = ttk.Checkbutton(doc.controls_frame, text="Trace Timings",
+                                             variable=self.trace_enabled, command=self.toggle_tracing)
+        doc.trace_checkbox.pack(side="left", padx=5)
+    
+        doc.export_trace_button = ttk.Button(doc.controls_frame, text="Export Trace",
+                                             command=self.export_trace, bootstyle=SECONDARY)
+        doc.export_trace_button.pack(side="left", padx=5)
+    
+        # Preview container frame.
+        doc.preview_container_frame = ttk.Frame(doc.preview_area_frame)
+        doc.preview_container_frame.pack(expand=True, fill="both", padx=10, pady=(5, 10))
+    
+        # Create a dedicated preview area (persistent container).
+        doc.preview_area = ttk.Frame(doc.preview_container_frame)
+        doc.preview_area.pack(expand=True, fill="both")
+    
+        # Create preview widgets as children of preview_area.
+        doc.html_text = tk.Text(doc.preview_area, wrap="word",
+                                font=self.text_font, relief="flat", borderwidth=0, background="#f8f8f8")
+        # The rendered preview is built when it first has something to show.
+        doc.html_view = None
+    
+        # Key releases render (in live mode) and keep the preview at the cursor.
+        doc.md_text.bind("<KeyRelease>", self.on_key_release)
+        doc.md_text.bind("<ButtonRelease-1>", self.sync_preview_to_cursor)
+        self.update_editor_mode(doc)
+    
+    def create_settings_tab(self):
+        # Settings tab for style mappings and font size.
+        self.settings_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.settings_frame, text="Settings")
+        pad = {"padx": 5, "pady": 5}
+        row = 0
+        
+        ttk.Label(self.settings_frame, text="Bold Tag (for **text**):").grid(row=row, column=0, sticky="w", **pad)
+        self.bold_entry = ttk.Entry(self.settings_frame)
+        self.bold_entry.grid(row=row, column=1, **pad)
+        self.bold_entry.insert(0, self.style_mapping.get("bold", "strong"))
+        row += 1
+        
+        ttk.Label(self.settings_frame, text="Italic Tag (for *text*):").grid(row=row, column=0, sticky="w", **pad)
+        self.italic_entry = ttk.Entry(self.settings_frame)
+        self.italic_entry.grid(row=row, column=1, **pad)
+        self.italic_entry.insert(0, self.style_mapping.get("italic", "em"))
+        row += 1
+        
+        ttk.Label(self.settings_frame, text="Code Tag (for `text`):").grid(row=row, column=0, sticky="w", **pad)
+        self.code_entry = ttk.Entry(self.settings_frame)
+        self.code_entry.grid(row=row, column=1, **pad)
+        self.code_entry.insert(0, self.style_mapping.get("code", "code"))
+        row += 1
+        
+        ttk.Label(self.settings_frame, text="Line Break Tag (for <br>):").grid(row=row, column=0, sticky="w", **pad)
+        self.br_entry = ttk.Entry(self.settings_frame)
+        self.br_entry.grid(row=row, column=1, **pad)
+        self.br_entry.insert(0, self.style_mapping.get("br", "br"))
+        row += 1
+        
+        # Headings H1 to H6.
+        self.heading_entries = {}
+        for i in range(1, 7):
+            ttk.Label(self.settings_frame, text=f"H{i} Tag (for {'#'*i} heading):").grid(row=row, column=0, sticky="w", **pad)
+            entry = ttk.Entry(self.settings_frame)
+            entry.grid(row=row, column=1, **pad)
+            entry.insert(0, self.style_mapping.get(f"h{i}", f"h{i}"))
+            self.heading_entries[f"h{i}"] = entry
+            row += 1
+        
+        # New: Paragraph tag.
+        ttk.Label(self.settings_frame, text="Paragraph Tag (for <p>):").grid(row=row, column=0, sticky="w", **pad)
+        self.p_entry = ttk.Entry(self.settings_frame)
+        self.p_entry.grid(row=row, column=1, **pad)
+        self.p_entry.insert(0, self.style_mapping.get("p", "p"))
+        row += 1
+        
+        # New: Block Quote tag.
+        ttk.Label(self.settings_frame, text="Block Quote Tag (for <blockquote>):").grid(row=row, column=0, sticky="w", **pad)
+        self.blockquote_entry = ttk.Entry(self.settings_frame)
+        self.blockquote_entry.grid(row=row, column=1, **pad)
+        self.blockquote_entry.insert(0, self.style_mapping.get("blockquote", "blockquote"))
+        row += 1
+        
+        # Only Font Size is adjustable.
+        ttk.Label(self.settings_frame, text="Font Size (Editor & Preview):").grid(row=row, column=0, sticky="w", **pad)
+        self.font_size_entry = ttk.Entry(self.settings_frame)
+        self.font_size_entry.grid(row=row, column=1, **pad)
+        self.font_size_entry.insert(0, str(self.font_size))
+        row += 1
+        
+        # Delay between the last keystroke and a live preview render.
+        ttk.Label(self.settings_frame, text="Live Preview Delay (ms):").grid(row=row, column=0, sticky="w", **pad)
+        self.debounce_entry = ttk.Entry(self.settings_frame)
+        self.debounce_entry.grid(row=row, column=1, **pad)
+        self.debounce_entry.insert(0, str(self.preview_debounce_ms))
+        row += 1
+        
+        self.save_settings_button = ttk.Button(self.settings_frame, text="Save Settings",
+                                               command=self.save_settings, bootstyle=INFO)
+        self.save_settings_button.grid(row=row, column=0, columnspan=2, pady=10)
+        # Bind CTRL+S in the settings tab to save settings.
+        self.settings_frame.bind("<Control-s>", lambda event: self.save_settings())
+    
+    def new_document(self, event=None):
+        doc = Document()
+        self.create_document_tab(doc)
+        self.documents.append(doc)
+        self.notebook.select(doc.frame)
+        self.activate_document(doc)
+        return "break"
+    
+    def is_untouched(self, doc):
+        # A new document nothing was typed into, which a file can replace.
+        return doc.filepath is None and doc.load_file is None and not doc.source_modified \
+            and doc.md_text.compare("end-1c", "==", "1.0")
+    
+    def show_document_name(self, doc):
+        doc.md_label.config(text=doc.name)
+        self.notebook.tab(doc.frame, text=doc.name)
+    
+    def on_tab_changed(self, event=None):
+        selected = self.notebook.select()
+        for doc in self.documents:
+            if str(doc.frame) == selected:
+                self.activate_document(doc)
+                return
+    
+    def activate_document(self, doc):
+        # The tab shows the document's cached render straight away; it is
+        # re-rendered in the background if it is out of date or was evicted.
+        self.doc = doc
+        self.view_ticks += 1
+        doc.last_viewed = self.view_ticks
+        if self.render_due(doc) or (doc.evicted and doc.load_file is None):
+            self.render_revision += 1
+            self.request_live_render()
+        self.schedule_prerender()
+    
+    def close_document(self, event=None):
+        doc = self.doc
+        if str(doc.frame) != self.notebook.select():
+            return "break"
+        if doc.source_modified and doc.load_file is None:
+            answer = messagebox.askyesnocancel("Unsaved Changes", f"Save changes to {doc.name}?")
+            if answer is None:
+                return "break"
+            if answer:
+                self.save_markdown()
+                doc.autosaver.flush()
+                self.poll_saves()
+                # The save failed or its dialog was cancelled.
+                if doc.source_modified:
+                    return "break"
+        self.stop_loading(doc)
+        if doc.autosave_after_id is not None:
+            self.root.after_cancel(doc.autosave_after_id)
+        doc.autosaver.close()
+        doc.highlighter.close()
+        index = self.documents.index(doc)
+        self.documents.remove(doc)
+        doc.frame.destroy()
+        if not self.documents:
+            self.new_document()
+        else:
+            # The neighbouring document, rather than the Settings tab.
+            successor = self.documents[min(index, len(self.documents) - 1)]
+            self.notebook.select(successor.frame)
+            self.activate_document(successor)
+        return "break"
+    
+    def toggle_live_preview(self):
+        for doc in self.documents:
+            self.update_editor_mode(doc)
+        self.convert_to_html()
+    
+    def update_editor_mode(self, doc):
+        # Remove any existing grid placements from preview_area.
+        doc.html_text.grid_forget()
+        if doc.html_view is not None:
+            doc.html_view.grid_forget()
+    
+        # In live preview mode, grid both preview widgets side-by-side (resizable).
+        if self.live_preview.get():
+            doc.html_text.grid(row=0, column=0, sticky="nsew")
+            if doc.html_view is not None:
+                doc.html_view.grid(row=0, column=1, sticky="nsew")
+            doc.preview_area.columnconfigure(0, weight=1)
+            doc.preview_area.columnconfigure(1, weight=1)
+        else:
+            # In single preview mode, grid only one widget.
+            if self.render_preview.get():
+                if doc.html_view is not None:
+                    doc.html_view.grid(row=0, column=0, sticky="nsew")
+            else:
+                doc.html_text.grid(row=0, column=0, sticky="nsew")
+            doc.preview_area.columnconfigure(0, weight=1)
+        doc.preview_area.rowconfigure(0, weight=1)
+    
+    def on_key_release(self, event):
+        doc = self.doc
+        self.sync_preview_to_cursor()
+        # Keys that did not modify the buffer (navigation, modifiers) do not
+        # trigger a render or an autosave.
+        if not doc.md_text.edit_modified():
+            return
+        doc.md_text.edit_modified(False)
+        doc.source_modified = True
+        doc.edit_revision += 1
+        # Debounce: restart the timers on every key, checkpoint and render
+        # once typing pauses.
+        if doc.autosave_after_id is not None:
+            self.root.after_cancel(doc.autosave_after_id)
+        doc.autosave_after_id = self.root.after(self.autosave_delay_ms, self.autosave, doc)
+        if not self.live_preview.get():
+            return
+        self.render_revision += 1
+        if self.debounce_after_id is not None:
+            self.root.after_cancel(self.debounce_after_id)
+        self.debounce_after_id = self.root.after(self.preview_debounce_ms, self.request_live_render)
+    
+    def request_live_render(self):
+        self.debounce_after_id = None
+        doc = self.doc
+        if self.render_worker is None:
+            self.render_worker = RenderWorker(self.style_mapping, self.tracer, self.render_cache)
+        with self.tracer.stage("md_text.get") as stage:
+            md_content = doc.md_text.get("1.0", "end-1c")
+            stage.set_output(len(md_content))
+        self.render_source = (doc, doc.edit_revision, self.mapping_version)
+        # Renders of freshly opened files go to the render cache too.
+        self.render_worker.submit(self.render_revision, md_content, self.style_mapping,
+                                  store=doc.render_wanted)
+        if self.poll_after_id is None:
+            self.poll_after_id = self.root.after(15, self.poll_live_render)
+    
+    def poll_live_render(self):
+        self.poll_after_id = None
+        for revision, html_content, blocks, error in self.render_worker.poll():
+            if isinstance(revision, tuple):
+                # A document from another tab, rendered in the background.
+                doc, edit_revision, mapping_version = revision
+                if doc in self.documents:
+                    if error is not None:
+                        # Not retried until the document changes again.
+                        doc.render_wanted = False
+                        doc.rendered = (edit_revision, mapping_version)
+                    else:
+                        self.store_render(doc, html_content, (edit_revision, mapping_version))
+                        self.show_html(html_content, doc, blocks)
+                continue
+            # Stale results (the buffer changed since) are dropped.
+            if revision != self.render_revision:
+                continue
+            if error is not None:
+                messagebox.showerror("Conversion Error", f"Error during markdown conversion:\n{error}")
+            else:
+                # The result goes to the document it was requested for, even
+                # if another tab has been selected since.
+                doc, edit_revision, mapping_version = self.render_source
+                if doc in self.documents:
+                    self.store_render(doc, html_content, (edit_revision, mapping_version))
+                    self.show_html(html_content, doc, blocks)
+        if not self.render_worker.is_idle():
+            self.poll_after_id = self.root.after(15, self.poll_live_render)
+        else:
+            self.trim_render_cache()
+            self.schedule_prerender()
+    
+    def render_due(self, doc):
+        # True if the document's render is out of date: edited or rendered
+        # with an older style mapping since, or never rendered after loading.
+        if doc.load_file is not None:
+            return False
+        return doc.render_wanted or \
+            (doc.html is not None and doc.rendered != (doc.edit_revision, self.mapping_version))
+    
+    def schedule_prerender(self):
+        if self.prerender_after_id is None:
+            self.prerender_after_id = self.root.after_idle(self.prerender_next)
+    
+    def prerender_next(self):
+        # Re-render one out-of-date document from another tab, the most
+        # recently viewed first. Only while the worker has nothing to do and
+        # no live render is waiting to start; poll_live_render schedules the
+        # next one when the worker is idle again.
+        self.prerender_after_id = None
+        stale = [doc for doc in self.documents if doc is not self.doc and self.render_due(doc)]
+        if not stale or self.debounce_after_id is not None:
+            return
+        if self.render_worker is None:
+            self.render_worker = RenderWorker(self.style_mapping, self.tracer, self.render_cache)
+        elif not self.render_worker.is_idle():
+            return
+        doc = max(stale, key=lambda doc: doc.last_viewed)
+        md_content = doc.md_text.get("1.0", "end-1c")
+        self.render_worker.submit((doc, doc.edit_revision, self.mapping_version), md_content, self.style_mapping,
+                                  store=doc.render_wanted)
+        if self.poll_after_id is None:
+            self.poll_after_id = self.root.after(15, self.poll_live_render)
+    
+    def store_render(self, doc, html_content, rendered):
+        doc.html = html_content
+        doc.rendered = rendered
+        doc.render_wanted = False
+        doc.evicted = False
+        self.evict_renders()
+    
+    def evict_renders(self):
+        # Drop the cached renders of the least recently viewed tabs while all
+        # of them together are over PREVIEW_CACHE_CHARS. The selected tab, and
+        # tabs with hand edits in the raw HTML pane, keep theirs.
+        cached = [doc for doc in self.documents if doc.html is not None]
+        total = sum(len(doc.html) for doc in cached)
+        for doc in sorted(cached, key=lambda doc: doc.last_viewed):
+            if total <= PREVIEW_CACHE_CHARS:
+                return
+            if doc is self.doc or doc.html_text.edit_modified():
+                continue
+            total -= len(doc.html)
+            doc.html = None
+            doc.rendered = None
+            doc.evicted = True
+            if doc.html_view is not None:
+                doc.view_position = doc.html_view.position()
+                doc.html_view.destroy()
+                doc.html_view = None
+            doc.html_text.delete("1.0", "end")
+            doc.html_text.edit_modified(False)
+            doc.html_text_content = None
+            doc.html_view_content = None
+    
+    def autosave(self, doc):
+        doc.autosave_after_id = None
+        if doc.load_file is not None or not doc.source_modified:
+            return
+        changed_lines = doc.changed_lines
+        doc.changed_lines = None
+        if not doc.autosaver.needs_text:
+            # Only the lines edited since the last checkpoint are read, and
+            # journaled.
+            if changed_lines is not None:
+                first, old_end, new_end = changed_lines
+                with self.tracer.stage("md_text.get") as stage:
+                    text = doc.md_text.get(f"{first + 1}.0", f"{new_end}.end")
+                    stage.set_output(len(text))
+                doc.autosaver.checkpoint_lines(first, old_end - first, text, doc.filepath)
+            return
+        with self.tracer.stage("md_text.get") as stage:
+            md_content = doc.md_text.get("1.0", "end-1c")
+            stage.set_output(len(md_content))
+        # The autosave thread diffs against the last checkpoint and journals
+        # only the changed span.
+        doc.autosaver.checkpoint(md_content, doc.filepath)
+    
+    def recover_sessions(self):
+        # Offer the edits left unsaved by editors that exited or crashed,
+        # newest first. Each restored document gets a tab; the ones postponed
+        # with Cancel are offered again on the next start.
+        for session_dir, info in find_sessions():
+            path = info.get("path")
+            started = time.strftime("%Y-%m-%d %H:%M", time.localtime(info.get("started", 0)))
+            answer = messagebox.askyesnocancel(
+                "Recover Unsaved Changes",
+                f"Unsaved changes to {path or 'an untitled document'} were left by a session started "
+                f"{started}.\n\nRestore them? (No discards them.)")
+            if answer is None:
+                continue
+            if not answer:
+                discard_session(session_dir)
+                continue
+            try:
+                md_content = replay(session_dir)
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not recover unsaved changes:\n{e}")
+                continue
+            if not self.is_untouched(self.doc):
+                self.new_document()
+            doc = self.doc
+            doc.md_text.delete("1.0", "end")
+            doc.md_text.insert("1.0", md_content)
+            doc.md_text.edit_reset()
+            doc.md_text.edit_modified(False)
+            doc.source_modified = True
+            doc.edit_revision += 1
+            doc.filepath = path
+            doc.name = os.path.basename(path) if path else "Untitled"
+            self.show_document_name(doc)
+            # The old session is dropped once this one holds the edits.
+            doc.autosaver.checkpoint(md_content, path)
+            doc.changed_lines = None
+            doc.autosaver.flush()
+            discard_session(session_dir)
+            doc.render_wanted = True
+            self.render_revision += 1
+            self.request_live_render()
+    
+    def on_close(self):
+        for doc in self.documents:
+            if doc.autosave_after_id is not None:
+                self.root.after_cancel(doc.autosave_after_id)
+                doc.autosave_after_id = None
+            doc.autosaver.flush()
+        self.poll_saves()
+        for doc in self.documents:
+            if doc.source_modified and doc.load_file is None:
+                # Closing without saving leaves the edits recoverable.
+                self.autosave(doc)
+            else:
+                doc.autosaver.discard()
+            doc.autosaver.flush()
+        self.root.destroy()
+    
+    def sync_preview_to_cursor(self, event=None):
+        # Keep the rendered preview near the cursor, by relative position.
+        doc = self.doc
+        if doc.html_view is None or not (self.live_preview.get() or self.render_preview.get()):
+            return
+        line = int(doc.md_text.index("insert").split(".")[0])
+        last_line = int(doc.md_text.index("end-1c").split(".")[0])
+        doc.html_view.show_fraction((line - 1) / max(last_line - 1, 1))
+    
+    def undo_action(self, event):
+        try:
+            self.doc.md_text.edit_undo()
+        except tk.TclError:
+            pass
+        return "break"
+    
+    def redo_action(self, event):
+        try:
+            self.doc.md_text.edit_redo()
+        except tk.TclError:
+            pass
+        return "break"
+    
+    def get_converter(self):
+        if self.converter is None:
+            self.converter = MarkdownConverter(self.style_mapping)
+        return self.converter
+    
+    def convert_to_html(self):
+        # A synchronous render supersedes any live render still in flight.
+        doc = self.doc
+        self.render_revision += 1
+        with self.tracer.stage("md_text.get") as stage:
+            md_content = doc.md_text.get("1.0", "end-1c")
+            stage.set_output(len(md_content))
+        with self.tracer.stage("cache lookup", len(md_content)):
+            cache_key = self.render_cache.key(md_content, self.style_mapping)
+            html_content = self.render_cache.get(cache_key)
+        if html_content is None:
+            try:
+                with self.tracer.stage("convert", len(md_content)) as stage:
+                    html_content = self.get_converter().convert(md_content)
+                    stage.set_output(len(html_content))
+            except Exception as e:
+                messagebox.showerror("Conversion Error", f"Error during markdown conversion:\n{e}")
+                return
+            self.render_cache.put(cache_key, html_content, evict=False)
+            self.trim_render_cache()
+        self.store_render(doc, html_content, (doc.edit_revision, self.mapping_version))
+        self.show_html(html_content)
+    
+    def trim_render_cache(self):
+        if self.render_cache.written < self.cache_trim_at:
+            return
+        if self.cache_trim_thread is not None and self.cache_trim_thread.is_alive():
+            return
+        self.cache_trim_at = self.render_cache.written + CACHE_TRIM_BYTES
+        self.cache_trim_thread = self.render_cache.trim_in_background()
+    
+    def show_html(self, html_content, doc=None, blocks=None):
+        doc = doc or self.doc
+        if self.live_preview.get():
+            self.update_html_text(doc, html_content)
+            self.update_html_view(doc, html_content, blocks)
+        else:
+            if self.render_preview.get():
+                self.update_html_view(doc, html_content, blocks)
+            else:
+                self.update_html_text(doc, html_content)
+        if self.tracer.enabled:
+            doc.trace_status.config(text=f"p50/p95: {self.tracer.summary()}")
+    
+    def toggle_tracing(self):
+        self.tracer.enabled = self.trace_enabled.get()
+        if not self.tracer.enabled:
+            for doc in self.documents:
+                doc.trace_status.config(text="")
+    
+    def export_trace(self):
+        file_path = filedialog.asksaveasfilename(initialfile="md2html_trace.json", defaultextension=".json",
+                                                 filetypes=[("Chrome trace", "*.json"), ("All files", "*.*")])
+        if file_path:
+            try:
+                count = self.tracer.export_chrome_trace(file_path)
+                messagebox.showinfo("Trace Exported", f"Wrote {count} events. Open the file in "
+                                                      "chrome://tracing or ui.perfetto.dev.")
+            except Exception as e:
+                messagebox.showerror("Error", f"Error saving trace file:\n{e}")
+    
+    def update_html_text(self, doc, html_content):
+        # Replace only the lines that changed since the last update, which keeps
+        # the scroll position and costs Tk work proportional to the change.
+        old_content = doc.html_text_content
+        with self.tracer.stage("html_text update", len(html_content)):
+            if old_content is None or doc.html_text.edit_modified():
+                doc.html_text.delete("1.0", "end")
+                doc.html_text.insert("1.0", html_content)
+            elif html_content != old_content:
+                start, old_end, new_end = changed_line_range(old_content, html_content)
+                new_lines = html_content.split("\n")[start:new_end]
+                replacement = "\n".join(new_lines)
+                if new_end <= html_content.count("\n"):
+                    replacement += "\n"
+                doc.html_text.delete(f"{start + 1}.0", f"{old_end + 1}.0")
+                doc.html_text.insert(f"{start + 1}.0", replacement)
+        # The user may edit the raw HTML pane; that forces a full update.
+        doc.html_text.edit_modified(False)
+        doc.html_text_content = html_content
+    
+    def update_html_view(self, doc, html_content, blocks=None):
+        # The preview only lays out blocks near the viewport; skip it entirely
+        # when the HTML is unchanged.
+        if html_content == doc.html_view_content:
+            return
+        if doc.html_view is None:
+            doc.html_view = VirtualHTMLPreview(doc.preview_area, background="#f8f8f8", font=self.text_font)
+            self.update_editor_mode(doc)
+        with self.tracer.stage("html_view.set_html", len(html_content)):
+            doc.html_view.set_html(html_content, blocks)
+        if doc.view_position is not None:
+            # Back to where the preview was before it was evicted.
+            doc.html_view.moveto(doc.view_position)
+            doc.view_position = None
+        doc.html_view_content = html_content
+    
+    def save_html(self):
+        doc = self.doc
+        if doc.load_file is not None:
+            return
+        if doc.filepath:
+            base = os.path.basename(doc.filepath)
+            default_name = os.path.splitext(base)[0] + ".html"
+        else:
+            default_name = "untitled.html"
+        file_path = filedialog.asksaveasfilename(initialfile=default_name,
+                                                 defaultextension=".html",
+                                                 filetypes=[("HTML files", "*.html"), ("All files", "*.*")])
+        if file_path:
+            try:
+                raw_html_shown = self.live_preview.get() or not self.render_preview.get()
+                if raw_html_shown and doc.html_text.edit_modified():
+                    # Keep hand edits made in the raw HTML pane.
+                    with open(file_path, "w", encoding="utf-8") as f:
+                        f.write(doc.html_text.get("1.0", "end-1c"))
+                elif doc.filepath and not doc.source_modified \
+                        and not doc.md_text.edit_modified() and not doc.saves_in_flight:
+                    # The buffer matches the file on disk: stream the file
+                    # straight to HTML rather than copying it out of widgets.
+                    convert_file(doc.filepath, file_path, self.get_converter())
+                else:
+                    html_content = self.get_converter().convert(doc.md_text.get("1.0", "end-1c"))
+                    with open(file_path, "w", encoding="utf-8") as f:
+                        f.write(html_content)
+                messagebox.showinfo("Saved", "HTML file saved successfully!")
+            except Exception as e:
+                messagebox.showerror("Error", f"Error saving HTML file:\n{e}")
+    
+    def save_markdown(self, event=None):
+        doc = self.doc
+        if doc.load_file is not None:
+            return "break"
+        # If no file is set or the file doesn't exist, prompt for Save As.
+        if doc.filepath is None or not os.path.exists(doc.filepath):
+            new_path = filedialog.asksaveasfilename(defaultextension=".md",
+                                                    filetypes=[("Markdown files", "*.md"), ("All files", "*.*")])
+            if not new_path:
+                return "break"
+            doc.filepath = new_path
+        # The file is replaced atomically on the autosave thread; the outcome
+        # is picked up by poll_saves. A pending checkpoint is covered by the
+        # save.
+        if doc.autosave_after_id is not None:
+            self.root.after_cancel(doc.autosave_after_id)
+            doc.autosave_after_id = None
+        doc.autosaver.save(doc.filepath, doc.md_text.get("1.0", "end-1c"))
+        doc.changed_lines = None
+        doc.md_text.edit_modified(False)
+        doc.saves_in_flight.append(doc.edit_revision)
+        if self.save_poll_after_id is None:
+            self.save_poll_after_id = self.root.after(15, self.poll_saves)
+        return "break"
+    
+    def poll_saves(self):
+        self.save_poll_after_id = None
+        for doc in self.documents:
+            for path, error in doc.autosaver.poll():
+                revision = doc.saves_in_flight.pop(0)
+                if error is not None:
+                    messagebox.showerror("Error", f"Error saving Markdown file:\n{error}")
+                    continue
+                # Edits made while the save was running are still unsaved.
+                if path == doc.filepath and revision == doc.edit_revision:
+                    doc.source_modified = False
+                doc.name = os.path.basename(path)
+                self.show_document_name(doc)
+        if any(doc.saves_in_flight for doc in self.documents):
+            self.save_poll_after_id = self.root.after(15, self.poll_saves)
+    
+    def open_markdown(self, event=None):
+        file_path = filedialog.askopenfilename(defaultextension=".md",
+                                               filetypes=[("Markdown files", "*.md"), ("All files", "*.*")])
+        if file_path:
+            # A file that is already open is brought to the front.
+            for doc in self.documents:
+                if doc.filepath and os.path.abspath(doc.filepath) == os.path.abspath(file_path):
+                    self.notebook.select(doc.frame)
+                    return "break"
+            try:
+                load_file = open(file_path, "r", encoding="utf-8")
+                file_size = os.path.getsize(file_path)
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not open file: {e}")
+                return "break"
+            # The file gets a new tab unless the selected one is still empty.
+            if not self.is_untouched(self.doc):
+                self.new_document()
+            doc = self.doc
+            # The file is inserted a chunk per event-loop step, so the window
+            # stays responsive and shows progress on large files. The editor
+            # is read-only until loading finishes.
+            doc.load_file = load_file
+            doc.load_path = file_path
+            doc.loaded_chars = 0
+            doc.name = os.path.basename(file_path)
+            self.show_document_name(doc)
+            doc.md_text.config(state="normal")
+            doc.md_text.delete("1.0", "end")
+            doc.md_text.config(state="disabled")
+            doc.load_progress.config(maximum=max(file_size, 1), value=0)
+            doc.load_progress.pack(side="right", padx=5)
+            self.root.after_idle(self.load_next_chunk, doc)
+        return "break"
+    
+    def load_next_chunk(self, doc):
+        if doc.load_file is None:
+            return
+        try:
+            chunk = doc.load_file.read(LOAD_CHUNK_SIZE)
+        except Exception as e:
+            self.stop_loading(doc)
+            doc.md_text.delete("1.0", "end")
+            messagebox.showerror("Error", f"Could not open file: {e}")
+            return
+        if chunk:
+            doc.md_text.config(state="normal")
+            doc.md_text.insert("end-1c", chunk)
+            doc.md_text.config(state="disabled")
+            # Characters read, as an estimate of bytes read.
+            doc.loaded_chars += len(chunk)
+            doc.load_progress.config(value=min(doc.loaded_chars, doc.load_progress.cget("maximum")))
+            self.root.after(1, self.load_next_chunk, doc)
+            return
+        file_path = doc.load_path
+        self.stop_loading(doc)
+        doc.md_text.edit_reset()
+        doc.md_text.edit_modified(False)
+        doc.source_modified = False
+        doc.edit_revision += 1
+        doc.filepath = file_path
+        doc.autosaver.mark_clean(file_path)
+        # A file rendered before is shown from the render cache right away.
+        # Otherwise, since large files take a while to convert, it is
+        # rendered off the UI thread, or in idle time if another tab has been
+        # selected meanwhile.
+        md_content = doc.md_text.get("1.0", "end-1c")
+        with self.tracer.stage("cache lookup", len(md_content)):
+            html_content = self.render_cache.get(self.render_cache.key(md_content, self.style_mapping))
+        if html_content is not None:
+            self.store_render(doc, html_content, (doc.edit_revision, self.mapping_version))
+            self.show_html(html_content, doc)
+            return
+        doc.render_wanted = True
+        if doc is self.doc:
+            self.render_revision += 1
+            self.request_live_render()
+        else:
+            self.schedule_prerender()
+    
+    def stop_loading(self, doc):
+        if doc.load_file is not None:
+            doc.load_file.close()
+            doc.load_file = None
+            doc.load_path = None
+        doc.md_text.config(state="normal")
+        doc.load_progress.pack_forget()
+    
+    def load_config(self):
+        config = read_config(self.config_file, create_default=True)
+        style_mapping = config.get("style_mapping", self.style_mapping)
+        try:
+            check_style_mapping(style_mapping)
+            self.style_mapping = style_mapping
+        except ValueError as e:
+            messagebox.showerror("Invalid Tag", f"Error in config file {self.config_file}:\n{e}\n\n"
+                                                "The default tags are used instead.")
+        self.mapping_version += 1
+        self.converter = None
+        self.font_family = config.get("font_family", self.font_family)
+        self.font_size = config.get("font_size", self.font_size)
+        self.preview_debounce_ms = config.get("preview_debounce_ms", self.preview_debounce_ms)
+        self.autosave_delay_ms = config.get("autosave_delay_ms", self.autosave_delay_ms)
+        self.text_font.config(family=self.font_family, size=self.font_size)
+    
+    def save_config(self, config):
+        try:
+            with open(self.config_file, "w", encoding="utf-8") as f:
+                json.dump(config, f, indent=4)
+        except Exception as e:
+            messagebox.showerror("Error", f"Error saving config file:\n{e}")
+    
+    def save_settings(self, event=None):
+        new_bold = self.bold_entry.get().strip()
+        new_italic = self.italic_entry.get().strip()
+        new_code = self.code_entry.get().strip()
+        new_br = self.br_entry.get().strip()
+        style_mapping = dict(self.style_mapping)
+        if new_bold:
+            style_mapping["bold"] = new_bold
+        if new_italic:
+            style_mapping["italic"] = new_italic
+        if new_code:
+            style_mapping["code"] = new_code
+        if new_br:
+            style_mapping["br"] = new_br
+        for i in range(1, 7):
+            key = f"h{i}"
+            entry_val = self.heading_entries[key].get().strip()
+            if entry_val:
+                style_mapping[key] = entry_val
+        
+        # New settings for paragraph and blockquote tags.
+        new_p = self.p_entry.get().strip()
+        if new_p:
+            style_mapping["p"] = new_p
+        new_bq = self.blockquote_entry.get().strip()
+        if new_bq:
+            style_mapping["blockquote"] = new_bq
+        try:
+            check_style_mapping(style_mapping)
+        except ValueError as e:
+            messagebox.showerror("Invalid Tag", f"{e}")
+            return
+        
+        try:
+            new_font_size = int(self.font_size_entry.get().strip())
+        except ValueError:
+            messagebox.showerror("Invalid Font Size", "Please enter a valid integer for font size.")
+            return
+        try:
+            new_debounce_ms = int(self.debounce_entry.get().strip())
+            if new_debounce_ms < 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Invalid Preview Delay", "Please enter a non-negative integer for the preview delay.")
+            return
+        self.style_mapping = style_mapping
+        self.preview_debounce_ms = new_debounce_ms
+        self.font_size = new_font_size
+        self.text_font.config(size=self.font_size)
+        for doc in self.documents:
+            doc.md_text.config(font=self.text_font)
+            doc.html_text.config(font=self.text_font)
+            doc.highlighter.update_fonts(self.text_font)
+        config = {
+            "style_mapping": self.style_mapping,
+            "font_family": self.font_family,  # fixed
+            "font_size": self.font_size,
+            "preview_debounce_ms": self.preview_debounce_ms,
+            "autosave_delay_ms": self.autosave_delay_ms
+        }
+        self.mapping_version += 1
+        self.converter = None
+        self.save_config(config)
+        messagebox.showinfo("Settings Saved", "Settings have been updated.")
+        for doc in self.documents:
+            self.update_editor_mode(doc)
+        self.convert_to_html()
+        # Other tabs follow the new mapping in idle time.
+        self.schedule_prerender()
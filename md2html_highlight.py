@@ -0,0 +1,166 @@
+# Markdown syntax highlighting for the editor, kept free of any GUI toolkit.
+# highlight_line tags a single line; the only state carried from line to
+# line is the fence of the fenced code block the line is in. The
+# IncrementalHighlighter keeps that state for every line of a buffer, so an
+# edit re-tags the edited lines and then only as far down as the state
+# differs from before (e.g. to the end of a fenced block that was opened or
+# closed), and a new buffer is tagged in slices from the top.
+import re
+import time
+import bisect
+
+TAGS = ("md_heading", "md_quote", "md_link", "md_bold", "md_italic", "md_code", "md_fence")
+
+# Fences the way python-markdown's fenced_code extension reads them: the
+# opener starts the line and the block ends at the same fence on its own.
+FENCE_RE = re.compile(r"(?:~{3,}|`{3,})")
+HEADING_RE = re.compile(r" {0,3}#{1,6}(?:[ \t]|$)")
+# "\t>" is read as a blockquote too (see normalize_markdown).
+QUOTE_RE = re.compile(r"(?: {0,3}|\t)>")
+CODE_SPAN_RE = re.compile(r"(?<!`)(`+)(?!`)(.+?)(?<!`)\1(?!`)")
+LINK_RE = re.compile(r"!?\[[^\]]*\](?:\([^)]*\)|\[[^\]]*\])")
+BOLD_RE = re.compile(r"(\*\*|__)(?=\S)(.+?)(?<=\S)\1")
+ITALIC_RE = re.compile(r"(?<![\w*])\*(?=[^\s*])(.+?)(?<=[^\s*])\*(?![*])|(?<![\w_])_(?=[^\s_])(.+?)(?<=[^\s_])_(?!\w)")
+
+# Lines tagged per batch, between checks of the deadline.
+BATCH_LINES = 64
+
+
+def highlight_line(line, fence):
+    # ([(tag, start, end), ...], fence after the line) for a line starting
+    # inside the fenced block opened by fence (None outside of one). An end
+    # of None runs through the end of the line, newline included, so
+    # backgrounds span the whole line.
+    if fence is not None:
+        if line.rstrip(" ") == fence:
+            return [("md_fence", 0, None)], None
+        return [("md_code", 0, None)], fence
+    match = FENCE_RE.match(line)
+    if match:
+        return [("md_fence", 0, None)], match.group()
+    spans = []
+    if HEADING_RE.match(line):
+        spans.append(("md_heading", 0, None))
+    elif QUOTE_RE.match(line):
+        spans.append(("md_quote", 0, None))
+    # Nothing inside a code span is markup: blank them out before looking
+    # for links and emphasis.
+    masked = line
+    if "`" in line:
+        for match in CODE_SPAN_RE.finditer(line):
+            spans.append(("md_code", match.start(), match.end()))
+            masked = masked[:match.start()] + " " * (match.end() - match.start()) + masked[match.end():]
+    if "[" in masked:
+        for match in LINK_RE.finditer(masked):
+            spans.append(("md_link", match.start(), match.end()))
+    if "*" in masked or "_" in masked:
+        for match in BOLD_RE.finditer(masked):
+            spans.append(("md_bold", match.start(), match.end()))
+        for match in ITALIC_RE.finditer(masked):
+            spans.append(("md_italic", match.start(), match.end()))
+    return spans, None
+
+
+class IncrementalHighlighter:
+    # Tags a line-addressed buffer through two callbacks:
+    #
+    #     get_lines(first, last)        -> the text of lines [first, last)
+    #     apply(first, last, spans)     replace the tags of lines [first, last)
+    #                                   with spans, {tag: [(line, start, end), ...]}
+    #
+    # Lines are numbered from 0. The owner reports edits with lines_replaced,
+    # tags the edited lines with run_edit and calls run in idle time to do
+    # the rest of the pending work.
+    def __init__(self, get_lines, apply):
+        self.get_lines = get_lines
+        self.apply = apply
+        self.reset(0)
+
+    def reset(self, line_count):
+        # states[i] is the fence in effect at the start of line i; dirty[i]
+        # is set while line i has not been tagged since it last changed.
+        self.states = [None] * (line_count + 1)
+        self.dirty = bytearray(b"\1") * line_count
+        # Sorted first lines of pending runs.
+        self.todo = [0] if line_count else []
+
+    def lines_replaced(self, first, old_count, new_count):
+        # Lines [first, first + old_count) were replaced by new_count lines
+        # (at least one each: an edit always touches a line). The state at
+        # the start of the line after them is kept, to tell where a re-tag
+        # can stop.
+        self.states[first + 1:first + old_count] = [None] * (new_count - 1)
+        self.dirty[first:first + old_count] = b"\1" * new_count
+        shift = new_count - old_count
+        todo = {first}
+        for line in self.todo:
+            if line >= first + old_count:
+                todo.add(line + shift)
+            elif line < first:
+                todo.add(line)
+        self.todo = sorted(todo)
+
+    def has_work(self):
+        return bool(self.todo)
+
+    def run(self, deadline=None, stop_line=None):
+        # Tags pending lines in order until the work is done, the deadline
+        # (a time.perf_counter() value) passes or the next pending line is
+        # at or past stop_line.
+        while self.todo:
+            start = self.todo[0]
+            if stop_line is not None and start >= stop_line:
+                return
+            resume = self.run_from(0, deadline, stop_line)
+            if resume is not None:
+                return
+
+    def run_edit(self, line, stop_line):
+        # Tags from an edited line on, up to stop_line at most. Pending runs
+        # above it (e.g. the initial tagging of a file just opened) are left
+        # to run: they may be any distance away. If they change the state
+        # the edited line starts in, they re-tag it when they get there.
+        index = bisect.bisect_left(self.todo, line)
+        if index < len(self.todo) and self.todo[index] == line and line < stop_line:
+            self.run_from(index, None, stop_line)
+
+    def run_from(self, index, deadline, stop_line):
+        # Tags the pending run todo[index] until a line ends in the state the
+        # next line was already tagged with, and drops it from todo. Returns
+        # the line to resume at, kept in todo, if stopped before that.
+        todo = self.todo
+        line = todo[index]
+        count = len(self.dirty)
+        states = self.states
+        dirty = self.dirty
+        while line < count:
+            last = min(line + BATCH_LINES, count)
+            if stop_line is not None:
+                last = min(last, max(stop_line, line + 1))
+            spans = {}
+            first = line
+            converged = False
+            for text in self.get_lines(first, last):
+                line_spans, after = highlight_line(text, states[line])
+                for tag, start, end in line_spans:
+                    spans.setdefault(tag, []).append((line, start, end))
+                dirty[line] = 0
+                line += 1
+                # Later runs that start here are covered by this one.
+                while index + 1 < len(todo) and todo[index + 1] <= line:
+                    todo.pop(index + 1)
+                if states[line] == after and (line == count or not dirty[line]):
+                    converged = True
+                    break
+                states[line] = after
+            self.apply(first, line, spans)
+            if converged:
+                break
+            if line < count and ((deadline is not None and time.perf_counter() >= deadline) or
+                                 (stop_line is not None and line >= stop_line)):
+                # The line's start state has changed under its tags.
+                dirty[line] = 1
+                todo[index] = line
+                return line
+        todo.pop(index)
+        return None
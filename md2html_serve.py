@@ -0,0 +1,206 @@
+# Render server of CustomMD2HTML: keeps warm converters resident in a pool of
+# worker processes and renders batches of documents sent over local HTTP (TCP
+# or a Unix socket), so callers do not pay interpreter startup and extension
+# setup per post.
+#
+#     POST /render  {"documents": ["# md", ...] or [{"id": ..., "markdown": ...}, ...],
+#                    "style_mapping": {...}}        (style_mapping is optional)
+#     ->            {"results": [{"id": ..., "html": ...} or {"id": ..., "error": ...}, ...]}
+#     GET /health   {"status": "ok", "workers": N}
+#
+# A request's style_mapping overrides keys of the configured mapping; unknown
+# keys and tags that cannot be used are rejected with 400.
+import os
+import sys
+import json
+import asyncio
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from md2html_core import (DEFAULT_CONFIG, STYLE_MAPPING_ELEMENTS, MarkdownConverter, check_style_mapping,
+                          read_config)
+
+MAX_BODY = 256 * 1024 * 1024
+MAX_CONVERTERS = 16
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+# Per worker process: converters by mapping hash, least recently used first.
+worker_converters = OrderedDict()
+
+
+def mapping_key(style_mapping):
+    return hashlib.sha256(json.dumps(style_mapping, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def render_batch(key, style_mapping, documents):
+    # Runs in a worker: [(id, markdown), ...] -> [(id, html, error), ...].
+    converter = worker_converters.get(key)
+    if converter is None:
+        converter = worker_converters[key] = MarkdownConverter(style_mapping)
+        if len(worker_converters) > MAX_CONVERTERS:
+            worker_converters.popitem(last=False)
+    else:
+        worker_converters.move_to_end(key)
+    results = []
+    for doc_id, md_content in documents:
+        try:
+            results.append((doc_id, converter.convert(md_content), None))
+        except Exception as e:
+            results.append((doc_id, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class RenderServer:
+    def __init__(self, style_mapping, workers=None):
+        self.style_mapping = dict(style_mapping)
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        # Effective mappings by the hash of the request's override.
+        self.mappings = OrderedDict()
+
+    def resolve_mapping(self, override):
+        # (hash, mapping) for a request's override of the configured mapping.
+        override_key = mapping_key(override)
+        resolved = self.mappings.get(override_key)
+        if resolved is None:
+            style_mapping = dict(self.style_mapping, **override)
+            resolved = self.mappings[override_key] = (mapping_key(style_mapping), style_mapping)
+            if len(self.mappings) > MAX_CONVERTERS:
+                self.mappings.popitem(last=False)
+        else:
+            self.mappings.move_to_end(override_key)
+        return resolved
+
+    async def render(self, payload):
+        if not isinstance(payload, dict) or not isinstance(payload.get("documents"), list):
+            raise RequestError(400, 'expected {"documents": [...]}')
+        override = payload.get("style_mapping") or {}
+        if not isinstance(override, dict):
+            raise RequestError(400, "style_mapping must be an object")
+        unknown = sorted(set(override) - set(STYLE_MAPPING_ELEMENTS))
+        if unknown:
+            raise RequestError(400, f"unknown style_mapping key(s): {', '.join(unknown)}")
+        try:
+            check_style_mapping(override)
+        except ValueError as e:
+            raise RequestError(400, str(e))
+        documents = []
+        for index, document in enumerate(payload["documents"]):
+            if isinstance(document, str):
+                documents.append((index, document))
+            elif isinstance(document, dict) and isinstance(document.get("markdown"), str):
+                documents.append((document.get("id", index), document["markdown"]))
+            else:
+                raise RequestError(400, f"document {index} has no markdown")
+        key, style_mapping = self.resolve_mapping(override)
+        # One chunk per worker, so a large batch uses the whole pool.
+        size = max(1, -(-len(documents) // self.workers))
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(self.pool, render_batch, key, style_mapping, documents[start:start + size])
+            for start in range(0, len(documents), size)))
+        results = []
+        for chunk in chunks:
+            for doc_id, html, error in chunk:
+                results.append({"id": doc_id, "error": error} if error else {"id": doc_id, "html": html})
+        return {"results": results}
+
+    async def handle_request(self, method, path, body):
+        if path == "/health":
+            return {"status": "ok", "workers": self.workers}
+        if path != "/render":
+            raise RequestError(404, f"no such endpoint: {path}")
+        if method != "POST":
+            raise RequestError(405, "use POST")
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise RequestError(400, f"invalid JSON: {e}")
+        return await self.render(payload)
+
+    async def handle_connection(self, reader, writer):
+        # HTTP/1.1 with keep-alive; one request at a time per connection.
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                    length = int(headers.get("content-length", "0"))
+                    if length > MAX_BODY:
+                        keep_alive = False
+                        raise RequestError(413, f"body over {MAX_BODY} bytes")
+                    body = await reader.readexactly(length) if length else b""
+                    status, response = 200, await self.handle_request(method, path.split("?")[0], body)
+                except RequestError as e:
+                    status, response = e.status, {"error": str(e)}
+                except ValueError:
+                    status, response, keep_alive = 400, {"error": "malformed request"}, False
+                except Exception as e:
+                    status, response = 500, {"error": f"{type(e).__name__}: {e}"}
+                data = json.dumps(response).encode("utf-8")
+                writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                             f"Content-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1"))
+                writer.write(data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port, unix_path=None):
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_connection, unix_path)
+            where = unix_path
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            where = f"http://{host}:{server.sockets[0].getsockname()[1]}"
+        # Warm every worker up front, so the first requests do not pay for it.
+        key, style_mapping = self.resolve_mapping({})
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, render_batch, key, style_mapping, [])
+                               for _ in range(self.workers)))
+        print(f"Serving on {where} with {self.workers} worker(s); Ctrl+C to stop", flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+def run_serve(args):
+    try:
+        config = read_config(args.config)
+        style_mapping = config.get("style_mapping", DEFAULT_CONFIG["style_mapping"])
+        check_style_mapping(style_mapping)
+    except (OSError, ValueError) as e:
+        print(f"Error reading config file {args.config}: {e}", file=sys.stderr)
+        return 2
+    server = RenderServer(style_mapping, args.jobs)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.pool.shutdown(cancel_futures=True)
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+    return 0
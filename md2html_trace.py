@@ -0,0 +1,107 @@
+# Per-stage timing of the render pipeline. Code under measurement wraps each
+# stage in "with tracer.stage(name, input_size) as stage:"; the tracer keeps
+# the events for a Chrome trace (chrome://tracing, Perfetto) and a rolling
+# window of durations per stage for p50/p95. While tracing is off, stage()
+# returns a shared do-nothing object, so instrumented code pays one attribute
+# check per stage.
+import os
+import json
+import time
+import threading
+from collections import deque
+
+
+class NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set_output(self, size):
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, input_size):
+        self.tracer = tracer
+        self.name = name
+        self.args = {} if input_size is None else {"input_size": input_size}
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+    def set_output(self, size):
+        self.args["output_size"] = size
+
+
+class Tracer:
+    MAX_EVENTS = 100000
+    WINDOW = 200
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+        self.events = deque(maxlen=self.MAX_EVENTS)
+        # Stage name -> recent durations in seconds, in first-seen order.
+        self.durations = {}
+
+    def stage(self, name, input_size=None):
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name, input_size)
+
+    def record(self, name, start, end, args):
+        # Stages may finish on any thread (the render worker records too).
+        with self.lock:
+            self.events.append((name, start, end, threading.get_ident(), args))
+            durations = self.durations.get(name)
+            if durations is None:
+                durations = self.durations[name] = deque(maxlen=self.WINDOW)
+            durations.append(end - start)
+
+    def clear(self):
+        with self.lock:
+            self.events.clear()
+            self.durations = {}
+
+    def percentiles(self):
+        # {stage: (p50, p95)} in seconds over the rolling window.
+        with self.lock:
+            windows = {name: sorted(durations) for name, durations in self.durations.items()}
+        return {name: (values[round(0.5 * (len(values) - 1))], values[round(0.95 * (len(values) - 1))])
+                for name, values in windows.items()}
+
+    def summary(self):
+        return "   ".join(f"{name} {p50 * 1000:.1f}/{p95 * 1000:.1f}ms"
+                          for name, (p50, p95) in self.percentiles().items())
+
+    def export_chrome_trace(self, path):
+        # Complete ("X") events in microseconds, plus thread names.
+        with self.lock:
+            events = list(self.events)
+        pid = os.getpid()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        trace = []
+        for tid in sorted({event[3] for event in events}):
+            trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                          "args": {"name": thread_names.get(tid, str(tid))}})
+        for name, start, end, tid, args in events:
+            trace.append({"name": name, "ph": "X", "pid": pid, "tid": tid,
+                          "ts": round((start - self.origin) * 1e6, 3),
+                          "dur": round((end - start) * 1e6, 3), "args": args})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+        return len(events)
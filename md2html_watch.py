@@ -0,0 +1,405 @@
+# Watch mode of CustomMD2HTML: keeps an HTML tree in sync with a tree of
+# Markdown files and re-renders only what changed. Changes are picked up with
+# inotify on Linux and by polling (stat only) elsewhere.
+import os
+import sys
+import stat
+import time
+import json
+import errno
+import select
+import signal
+import struct
+import ctypes
+import ctypes.util
+import hashlib
+
+from md2html_core import (DEFAULT_CONFIG, MarkdownConverter, changed_style_keys, check_style_mapping,
+                          read_config, write_atomic)
+
+# Per-file state, kept in the output directory between runs.
+INDEX_FILE = ".md2html_watch.json"
+# A burst of saves is rebuilt once, after this long without further events.
+COALESCE_DELAY = 0.02
+COALESCE_LIMIT = 0.5
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+
+class InotifyWatcher:
+    # Linux inotify through ctypes. inotify is not recursive, so every
+    # directory of the tree gets its own watch.
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watches = {}
+
+    def close(self):
+        os.close(self.fd)
+
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            # The directory may be gone again already.
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise OSError(error, os.strerror(error), path)
+        self.watches[wd] = path
+
+    def add_tree(self, top, skip_dir=None):
+        self.add_watch(top)
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != skip_dir]
+            for dirname in dirnames:
+                self.add_watch(os.path.join(dirpath, dirname))
+
+    def read_events(self, timeout):
+        # Returns [(path, mask), ...], waiting up to timeout seconds (None
+        # waits forever). A None path means events were lost.
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = self.EVENT_HEADER.unpack_from(data, offset)
+                offset += self.EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    events.append((None, mask))
+                    continue
+                directory = self.watches.get(wd)
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                if directory is None:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name)) if name else directory
+                events.append((path, mask))
+
+
+class SiteWatcher:
+    # Mirrors src_dir into out_dir. The index maps each source file (relative
+    # path) to [mtime_ns, size, sha256, style keys used]; a file is read and
+    # hashed only when its mtime or size changed, and rendered only when its
+    # content did. A deleted file whose content reappears under another name
+    # was renamed, and its output is moved instead of rendered again.
+    def __init__(self, src_dir, out_dir, config_file):
+        self.src_dir = os.path.abspath(src_dir)
+        self.out_dir = os.path.abspath(out_dir)
+        self.config_file = os.path.abspath(config_file)
+        self.index_path = os.path.join(self.out_dir, INDEX_FILE)
+        # An output tree inside the source tree is not scanned. When both are
+        # the same directory there is nothing to skip: only .md files are
+        # sources, so neither generated .html files nor the index are.
+        out_rel_path = os.path.relpath(self.out_dir, self.src_dir)
+        if out_rel_path == os.curdir or out_rel_path == os.pardir or out_rel_path.startswith(os.pardir + os.sep):
+            self.skip_dir = None
+        else:
+            self.skip_dir = self.out_dir
+        self.config_stat = None
+        self.style_mapping = self.read_style_mapping()
+        self.converter = MarkdownConverter(self.style_mapping)
+        self.index = {}
+        # Files whose output is out of date although the source is unchanged.
+        self.stale = set()
+
+    def read_style_mapping(self):
+        try:
+            st = os.stat(self.config_file)
+            self.config_stat = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            self.config_stat = None
+        config = read_config(self.config_file)
+        style_mapping = config.get("style_mapping", DEFAULT_CONFIG["style_mapping"])
+        check_style_mapping(style_mapping)
+        return style_mapping
+
+    def output_path(self, rel_path):
+        return os.path.join(self.out_dir, os.path.splitext(rel_path)[0] + ".html")
+
+    def relative(self, path):
+        # Source-relative path, or None for paths outside the source tree or
+        # inside an output tree nested in it.
+        if self.skip_dir is not None and (path == self.skip_dir or path.startswith(self.skip_dir + os.sep)):
+            return None
+        rel_path = os.path.relpath(path, self.src_dir)
+        if rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+            return None
+        return rel_path
+
+    def scan(self, top=None):
+        # {relative path: (mtime_ns, size)} of the .md files under top.
+        found = {}
+        pending = [top or self.src_dir]
+        while pending:
+            try:
+                entries = os.scandir(pending.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.path != self.skip_dir:
+                                pending.append(entry.path)
+                        elif entry.name.lower().endswith(".md"):
+                            rel_path = self.relative(entry.path)
+                            if rel_path is not None:
+                                st = entry.stat()
+                                found[rel_path] = (st.st_mtime_ns, st.st_size)
+                    except OSError:
+                        continue
+        return found
+
+    def load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.index = saved.get("files", {})
+        # Outputs written with another mapping are stale where it matters.
+        changed_keys = changed_style_keys(saved.get("style_mapping", {}), self.style_mapping)
+        if changed_keys:
+            self.stale |= {rel_path for rel_path, entry in self.index.items() if changed_keys & set(entry[3])}
+
+    def save_index(self):
+        try:
+            write_atomic(self.index_path, json.dumps({"style_mapping": self.style_mapping,
+                                                      "files": self.index}))
+        except OSError as e:
+            print(f"Could not save watch index {self.index_path}: {e}", file=sys.stderr)
+
+    def initial_sync(self):
+        self.load_index()
+        self.sync(set(self.scan()) | set(self.index))
+        self.save_index()
+
+    def poll(self):
+        # One polling round: stat the tree and the config file.
+        if self.config_changed():
+            self.reload_config()
+        found = self.scan()
+        candidates = {rel_path for rel_path, (mtime, size) in found.items()
+                      if rel_path not in self.index or self.index[rel_path][:2] != [mtime, size]}
+        candidates |= set(self.index) - set(found)
+        if candidates:
+            self.sync(candidates)
+
+    def config_changed(self):
+        try:
+            st = os.stat(self.config_file)
+            return (st.st_mtime_ns, st.st_size) != self.config_stat
+        except OSError:
+            return self.config_stat is not None
+
+    def apply_events(self, events, watcher):
+        candidates = set()
+        reload_config = False
+        for path, mask in events:
+            if path is None:
+                # The kernel dropped events; fall back to a full comparison.
+                self.poll()
+                continue
+            if path == self.config_file:
+                reload_config = True
+                continue
+            rel_path = self.relative(path)
+            if rel_path is None or rel_path == os.curdir:
+                continue
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files may have been created before the watch was added.
+                    watcher.add_tree(path, self.skip_dir)
+                    candidates |= set(self.scan(path))
+                prefix = rel_path + os.sep
+                candidates |= {indexed for indexed in self.index if indexed.startswith(prefix)}
+            elif rel_path.lower().endswith(".md"):
+                candidates.add(rel_path)
+        if reload_config:
+            self.reload_config()
+        if candidates:
+            self.sync(candidates)
+
+    def reload_config(self):
+        try:
+            style_mapping = self.read_style_mapping()
+        except (OSError, ValueError) as e:
+            print(f"Error reading config file {self.config_file}: {e}", file=sys.stderr)
+            return
+        changed_keys = changed_style_keys(self.style_mapping, style_mapping)
+        self.style_mapping = style_mapping
+        if not changed_keys:
+            return
+        self.converter.set_style_mapping(style_mapping)
+        # Only outputs that contain an element whose mapping changed.
+        affected = {rel_path for rel_path, entry in self.index.items() if changed_keys & set(entry[3])}
+        print(f"Style mapping changed ({', '.join(sorted(changed_keys))}): "
+              f"{len(affected)} file(s) affected")
+        self.stale |= affected
+        self.sync(affected)
+        self.save_index()
+
+    def sync(self, rel_paths):
+        start = time.perf_counter()
+        changed = {}
+        deleted = {}
+        for rel_path in rel_paths:
+            entry = self.index.get(rel_path)
+            try:
+                st = os.stat(os.path.join(self.src_dir, rel_path))
+            except OSError:
+                st = None
+            if st is None or not stat.S_ISREG(st.st_mode):
+                if entry is not None:
+                    deleted[rel_path] = entry
+                continue
+            current = (entry is not None and rel_path not in self.stale
+                       and os.path.exists(self.output_path(rel_path)))
+            if current and entry[:2] == [st.st_mtime_ns, st.st_size]:
+                continue
+            try:
+                with open(os.path.join(self.src_dir, rel_path), "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            digest = hashlib.sha256(data).hexdigest()
+            if current and entry[2] == digest:
+                # Touched but not changed.
+                entry[:2] = [st.st_mtime_ns, st.st_size]
+                continue
+            changed[rel_path] = (st, data, digest)
+
+        renamed = 0
+        moved_from = {entry[2]: rel_path for rel_path, entry in deleted.items() if rel_path not in self.stale}
+        for rel_path in list(changed):
+            st, data, digest = changed[rel_path]
+            old_path = moved_from.pop(digest, None)
+            if old_path is None or rel_path in self.index:
+                continue
+            try:
+                os.makedirs(os.path.dirname(self.output_path(rel_path)), exist_ok=True)
+                os.replace(self.output_path(old_path), self.output_path(rel_path))
+            except OSError:
+                continue
+            self.index[rel_path] = [st.st_mtime_ns, st.st_size, digest, deleted.pop(old_path)[3]]
+            del self.index[old_path]
+            del changed[rel_path]
+            renamed += 1
+
+        for rel_path in deleted:
+            del self.index[rel_path]
+            self.stale.discard(rel_path)
+            try:
+                os.remove(self.output_path(rel_path))
+            except OSError:
+                pass
+
+        rendered = 0
+        for rel_path, (st, data, digest) in changed.items():
+            rendered += self.render(rel_path, st, data, digest)
+        if changed or renamed or deleted:
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"Rendered {rendered} file(s), moved {renamed}, removed {len(deleted)} "
+                  f"in {elapsed:.1f}ms", flush=True)
+
+    def render(self, rel_path, st, data, digest):
+        self.stale.discard(rel_path)
+        try:
+            # Same newline handling as reading the file in text mode.
+            md_content = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+            write_atomic(self.output_path(rel_path), self.converter.convert(md_content))
+        except Exception as e:
+            # Not indexed, so the next change of the file retries it.
+            self.index.pop(rel_path, None)
+            print(f"FAILED {rel_path}: {type(e).__name__}: {e}", file=sys.stderr)
+            return False
+        self.index[rel_path] = [st.st_mtime_ns, st.st_size, digest, sorted(self.converter.used_style_keys())]
+        return True
+
+
+def open_inotify(site):
+    # An InotifyWatcher for the source tree and the config file, or None
+    # where inotify is not available.
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        watcher = InotifyWatcher()
+    except (OSError, AttributeError) as e:
+        print(f"inotify unavailable ({e}); polling instead", file=sys.stderr)
+        return None
+    try:
+        watcher.add_tree(site.src_dir, site.skip_dir)
+        watcher.add_watch(os.path.dirname(site.config_file))
+    except OSError as e:
+        # Typically too many directories for fs.inotify.max_user_watches.
+        print(f"inotify unavailable ({e}); polling instead", file=sys.stderr)
+        watcher.close()
+        return None
+    return watcher
+
+
+def stop_on_sigterm(signum, frame):
+    # systemd, docker stop and timeout stop the watcher with SIGTERM; handle
+    # it like Ctrl+C, so the index is saved on the way out.
+    raise KeyboardInterrupt
+
+
+def run_watch(args):
+    if not os.path.isdir(args.src):
+        print(f"Source directory not found: {args.src}", file=sys.stderr)
+        return 2
+    try:
+        site = SiteWatcher(args.src, args.out, args.config)
+    except (OSError, ValueError) as e:
+        print(f"Error reading config file {args.config}: {e}", file=sys.stderr)
+        return 2
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
+    watcher = None if args.poll else open_inotify(site)
+    site.initial_sync()
+    mode = "inotify" if watcher is not None else f"polling every {args.interval}s"
+    print(f"Watching {site.src_dir} ({len(site.index)} file(s), {mode}); Ctrl+C to stop", flush=True)
+    try:
+        while True:
+            if watcher is None:
+                time.sleep(args.interval)
+                site.poll()
+                continue
+            events = watcher.read_events(None)
+            # Collect the rest of a burst of saves before rebuilding.
+            deadline = time.monotonic() + COALESCE_LIMIT
+            while time.monotonic() < deadline:
+                more = watcher.read_events(COALESCE_DELAY)
+                if not more:
+                    break
+                events += more
+            site.apply_events(events, watcher)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site.save_index()
+        if watcher is not None:
+            watcher.close()
+    return 0